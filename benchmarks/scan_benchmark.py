@@ -0,0 +1,201 @@
+"""Benchmark of the scan hot path of DiodeExperiment.
+
+The scans run against the simulated device with a controlled round-trip latency, so the numbers only
+depend on the code and not on the hardware. Run it with:
+
+    python benchmarks/scan_benchmark.py --output scan_benchmark.json
+"""
+
+import json
+import platform
+import statistics
+import time
+from datetime import datetime
+
+import click
+
+import pythondaq.models.diode_experiment as diode_experiment
+from pythondaq.controllers.arduino_device import ArduinoVISADevice
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT
+
+# (start, stop) voltages of the scanned ranges
+RANGES = {"full": (0.0, 3.3), "partial": (1.5, 2.5)}
+
+
+class TimedResource:
+    """Wraps a device resource to count the queries and the time spent waiting on the device"""
+
+    def __init__(self, resource) -> None:
+        """Creates an instance of the TimedResource class
+
+        Args:
+            resource (object): pyvisa(-like) resource to wrap
+        """
+        self.resource = resource
+        self.queries = 0
+        self.io_time = 0.0
+
+    def __getattr__(self, name):
+        """Passes all other attributes on to the wrapped resource"""
+        return getattr(self.resource, name)
+
+    def _timed(self, method, *args):
+        """Calls a method of the resource and adds its duration to the I/O time"""
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.io_time += time.perf_counter() - start
+
+    def write(self, message):
+        """Writes a command to the resource"""
+        self.queries += 1
+        return self._timed(self.resource.write, message)
+
+    def read(self):
+        """Reads a reply from the resource"""
+        return self._timed(self.resource.read)
+
+    def query(self, message):
+        """Writes a command to the resource and reads the reply"""
+        self.queries += 1
+        return self._timed(self.resource.query, message)
+
+
+class TimedDevice(ArduinoVISADevice):
+    """ArduinoVISADevice which keeps track of the timed resource of the last opened connection"""
+
+    last = None
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Opens the connection and wraps the resource in a TimedResource"""
+        super().__init__(*args, **kwargs)
+        self.device = TimedResource(self.device)
+        TimedDevice.last = self.device
+
+
+class TimedExperiment(diode_experiment.DiodeExperiment):
+    """DiodeExperiment which records the time at which each point is stored"""
+
+    def clear(self) -> None:
+        """Clears the experiment data and the point times"""
+        super().clear()
+        self.point_times = []
+
+    def add_measurement(self, *args, **kwargs) -> None:
+        """Stores a measurement and the time at which it was stored"""
+        super().add_measurement(*args, **kwargs)
+        self.point_times.append(time.perf_counter())
+
+
+def run_case(start, stop, sample_size, latency) -> dict:
+    """Runs a single scan on the simulated device and collects the timings
+
+    Args:
+        start (float): analog voltage at which the scan starts
+        stop (float): analog voltage at which the scan stops
+        sample_size (int): number of samples to take at each voltage level
+        latency (float): round-trip time per query of the simulated device in seconds
+
+    Returns:
+        dict: timings of the scan
+    """
+    experiment = TimedExperiment(simulation={"latency": latency, "seed": 0})
+
+    begin = time.perf_counter()
+    experiment.scan(
+        port=SIMULATED_PORT, start=start, stop=stop, sample_size=sample_size
+    )
+    sweep_time = time.perf_counter() - begin
+
+    resource = TimedDevice.last
+    steps = len(experiment.point_times)
+    step_times = [
+        later - earlier
+        for earlier, later in zip(
+            [begin] + experiment.point_times, experiment.point_times
+        )
+    ]
+    step_times.sort()
+    return {
+        "start": start,
+        "stop": stop,
+        "sample_size": sample_size,
+        "steps": steps,
+        "queries": resource.queries,
+        "sweep_time": sweep_time,
+        "queries_per_second": resource.queries / sweep_time,
+        "step_time_mean": statistics.mean(step_times),
+        "step_time_median": statistics.median(step_times),
+        "step_time_p95": step_times[int(0.95 * (steps - 1))],
+        "step_time_max": step_times[-1],
+        "io_time": resource.io_time,
+        "overhead_per_point": (sweep_time - resource.io_time) / steps,
+    }
+
+
+@click.command()
+@click.option(
+    "-l",
+    "--latency",
+    default=0.0005,
+    type=click.FloatRange(0),
+    help="round-trip time per query of the simulated device in seconds",
+    show_default=True,
+)
+@click.option(
+    "-n",
+    "--sample-sizes",
+    default="1,2,5,10,25",
+    help="comma separated sample sizes to benchmark",
+    show_default=True,
+)
+@click.option(
+    "-r",
+    "--ranges",
+    default="full,partial",
+    help=f"comma separated voltage ranges to benchmark, choose from {', '.join(RANGES)}",
+    show_default=True,
+)
+@click.option(
+    "-o",
+    "--output",
+    default="scan_benchmark.json",
+    help="File path where the results are saved as JSON",
+    show_default=True,
+)
+def main(latency, sample_sizes, ranges, output):
+    """Benchmarks the scan hot path against the simulated device"""
+    # Make sure the scans open the timed device
+    diode_experiment.ArduinoVISADevice = TimedDevice
+
+    results = []
+    for range_name in ranges.split(","):
+        start, stop = RANGES[range_name]
+        for sample_size in [int(size) for size in sample_sizes.split(",")]:
+            result = run_case(start, stop, sample_size, latency)
+            result["range"] = range_name
+            results.append(result)
+            print(
+                f"{range_name:>8} n={sample_size:<3} {result['sweep_time']:8.3f} s "
+                f"{result['queries_per_second']:9.0f} queries/s "
+                f"{result['step_time_mean'] * 1e3:8.3f} ms/step "
+                f"{result['overhead_per_point'] * 1e6:8.1f} us overhead/point"
+            )
+
+    with open(output, "w") as file:
+        json.dump(
+            {
+                "created": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "latency": latency,
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    main()
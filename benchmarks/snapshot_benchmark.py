@@ -0,0 +1,100 @@
+"""Check of DiodeExperiment.snapshot() under concurrent read load.
+
+Reader threads take snapshots while scans run against the simulated device, and check that every snapshot is
+consistent: all columns have the same length and every row is completely calculated. The scans are also timed
+without readers, to show how much the readers slow down the acquisition. Run it with:
+
+    python benchmarks/snapshot_benchmark.py --readers 4
+"""
+
+import threading
+import time
+
+import click
+
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT
+from pythondaq.models.data_format import check_snapshot
+from pythondaq.models.diode_experiment import DiodeExperiment
+
+
+def run_scans(scans, readers, interval, **scan_options) -> dict:
+    """Runs scans while reader threads take snapshots
+
+    Args:
+        scans (int): number of scans, every scan clears the data of the previous one
+        readers (int): number of reader threads
+        interval (float): time in seconds a reader waits between snapshots
+        **scan_options: options for DiodeExperiment.scan()
+
+    Returns:
+        dict: time of the scans, number of snapshots and the problems that are found
+    """
+    experiment = DiodeExperiment(simulation={"latency": 0.0001, "seed": 0})
+    stop = threading.Event()
+    snapshots = [0] * readers
+    problems = set()
+
+    def read(reader):
+        while not stop.is_set():
+            problems.update(check_snapshot(experiment.snapshot()))
+            snapshots[reader] += 1
+            time.sleep(interval)
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    begin = time.perf_counter()
+    for _ in range(scans):
+        experiment.scan(port=SIMULATED_PORT, **scan_options)
+    scan_time = time.perf_counter() - begin
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {"scan_time": scan_time, "snapshots": sum(snapshots), "problems": problems}
+
+
+@click.command()
+@click.option(
+    "-r",
+    "--readers",
+    default=4,
+    type=click.IntRange(1),
+    help="number of reader threads",
+    show_default=True,
+)
+@click.option(
+    "-i",
+    "--interval",
+    default=0.001,
+    type=click.FloatRange(0),
+    help="time in seconds a reader waits between snapshots",
+    show_default=True,
+)
+@click.option(
+    "-s",
+    "--scans",
+    default=3,
+    type=click.IntRange(1),
+    help="number of scans per mode",
+    show_default=True,
+)
+def main(readers, interval, scans):
+    """Checks the consistency of snapshots under concurrent read load"""
+    failed = False
+    for raw in (False, True):
+        scan_options = {"start": 0.0, "stop": 3.3, "sample_size": 3, "raw": raw}
+        loaded = run_scans(scans, readers, interval, **scan_options)
+        alone = run_scans(scans, 0, interval, **scan_options)
+        print(
+            f"{'raw' if raw else 'normal':>6} {loaded['snapshots']:8d} snapshots "
+            f"{loaded['scan_time']:7.3f} s with readers {alone['scan_time']:7.3f} s without "
+            f"problems: {', '.join(sorted(loaded['problems'])) or 'none'}"
+        )
+        failed = failed or bool(loaded["problems"])
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
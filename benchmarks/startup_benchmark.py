@@ -0,0 +1,145 @@
+"""Benchmark of the start-up time of the diode CLI.
+
+Every subcommand is started in a new Python process, like a shell script does, and the wall time of the whole
+process is measured. The heavy modules that each subcommand imports are listed as well. The commands run in a
+temporary directory with a temporary home directory, so the caches and data store of the user are not touched.
+Run it with:
+
+    python benchmarks/startup_benchmark.py --repeat 10
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import click
+
+# Modules that take a noticeable part of the start-up time
+HEAVY_MODULES = ["numpy", "rich", "matplotlib", "pyvisa", "asyncio"]
+
+# Arguments of every benchmarked command, a data store directory named DataStore is made in the working directory
+COMMANDS = {
+    "help": ["--help"],
+    "list": ["list"],
+    "info": ["info", "-p", "SIM"],
+    "discover": ["discover", "-t", "0.5"],
+    "runs": ["runs"],
+    "convert": ["convert"],
+    "analyze": ["analyze", "--no-cache"],
+    "render": ["render"],
+    "scan": ["scan", "SIM", "-b", "3.3", "-e", "3.3", "-n", "1"],
+}
+
+# Runs the CLI in the new process and reports the imported heavy modules on the last line of stderr
+RUNNER = f"""
+import json, sys
+from pythondaq.views.cli import cmd_group
+try:
+    cmd_group(sys.argv[1:], standalone_mode=False)
+finally:
+    heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+    print("\\nHEAVY " + json.dumps(heavy), file=sys.stderr)
+"""
+
+
+def run_command(arguments, directory, environment) -> tuple:
+    """Runs a CLI command in a new process
+
+    Args:
+        arguments (list): the arguments of the command
+        directory (string): working directory of the process
+        environment (dict): environment variables of the process
+
+    Returns:
+        tuple: the wall time in seconds and the heavy modules that were imported
+    """
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-c", RUNNER, *arguments],
+        cwd=directory,
+        env=environment,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    wall_time = time.perf_counter() - start
+    assert process.returncode == 0, process.stderr
+    heavy = json.loads(process.stderr.rsplit("HEAVY ", 1)[1])
+    return wall_time, heavy
+
+
+@click.command()
+@click.option(
+    "-r",
+    "--repeat",
+    default=5,
+    type=click.IntRange(1),
+    help="number of times every command is started",
+    show_default=True,
+)
+@click.option(
+    "-c",
+    "--commands",
+    default=",".join(COMMANDS),
+    help="comma separated commands to benchmark",
+    show_default=True,
+)
+@click.option(
+    "-o",
+    "--output",
+    default="startup_benchmark.json",
+    help="File path where the results are saved as JSON",
+    show_default=True,
+)
+def main(repeat, commands, output):
+    """Benchmarks the start-up time of every subcommand of the diode CLI"""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        os.mkdir(os.path.join(directory, "DataStore"))
+        environment = {**os.environ, "HOME": directory, "USERPROFILE": directory}
+        source = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+        environment["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [os.path.abspath(source), os.environ.get("PYTHONPATH")])
+        )
+
+        for name in commands.split(","):
+            times = []
+            for _ in range(repeat):
+                wall_time, heavy = run_command(COMMANDS[name], directory, environment)
+                times.append(wall_time)
+            result = {
+                "command": name,
+                "arguments": COMMANDS[name],
+                "median": statistics.median(times),
+                "min": min(times),
+                "max": max(times),
+                "heavy_modules": heavy,
+            }
+            results.append(result)
+            print(
+                f"{name:>9} {result['median'] * 1e3:8.1f} ms median "
+                f"{result['min'] * 1e3:8.1f} ms min  imports: {', '.join(heavy) or '-'}"
+            )
+
+    with open(output, "w") as file:
+        json.dump(
+            {
+                "created": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "repeat": repeat,
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,76 @@
+import numpy as np
 import pyvisa
+from pythondaq.controllers.resource_pool import pool
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT, SimulatedArduino
 
+# Analog value of every digital value, rounded like convert_digital_analog()
+VOLTAGE_LUT = np.array([round(value * (3.3 / 1023), 2) for value in range(1024)])
 
-def list_devices():
+
+def list_devices(refresh=False, include_simulated=False):
     """This function shows which devices are connected
 
+    The list is cached by the shared resource pool, the ports are only probed again when the cached list is older
+    than pool.ttl seconds.
+
+    Args:
+        refresh (bool, optional): probe the ports even if the cached list is still valid. Defaults to False.
+        include_simulated (bool, optional): add the port of the simulated device to the list. Defaults to False.
+
     Returns:
         list: a list containing strings of the ports from the connected devices
     """
-    rm = pyvisa.ResourceManager("@py")
-    ports = rm.list_resources()
-    return ports
+    devices = pool.list_resources(refresh=refresh)
+    if include_simulated:
+        devices += (SIMULATED_PORT,)
+    return devices
 
 
 class ArduinoVISADevice:
     """This class allows users to manage their arduino experiment controller"""
 
-    def __init__(self, port) -> None:
+    def __init__(self, port, simulation=None, metrics=None, tracer=None) -> None:
         """Creates an instance of the ArduinoVISADevice class and connect to the controller
 
         Args:
             port (string): the port of the device to connect with
+            simulation (dict, optional): settings for the simulated device (latency, noise, ...), only used when port is the simulated port. Defaults to None.
+            metrics (ScanMetrics, optional): records the latency, errors and timeouts of every command, nothing is recorded if None. Defaults to None.
+            tracer (Tracer, optional): adds every command to a timeline, nothing is traced if None. Defaults to None.
+        """
+        self.port = port
+
+        # Output values which are sent without waiting for their acknowledgement
+        self._pending_acknowledgements = []
+
+        # The simulated device speaks the same protocol, so it replaces the VISA resource
+        if port == SIMULATED_PORT:
+            self.rm = None
+            self.device = SimulatedArduino(**(simulation or {}))
+        else:
+            # Make connection with device, an open session with the device is reused
+            self.rm = pool.resource_manager
+            self.device = pool.acquire(port)
+
+        # Only an instrumented device pays for timing its commands
+        if metrics is not None:
+            from pythondaq.controllers.instrumentation import InstrumentedResource
+
+            self.device = InstrumentedResource(self.device, metrics)
+        if tracer is not None:
+            from pythondaq.controllers.instrumentation import TracedResource
+
+            self.device = TracedResource(self.device, tracer)
+
+    def get_identification(self) -> str:
+        """Requests the identification string of the device
+
+        Returns:
+            string: identification string of the device, None if the device does not respond
         """
-        # Make connection with device
-        self.rm = pyvisa.ResourceManager("@py")
-        self.device = self.rm.open_resource(
-            port, read_termination="\r\n", write_termination="\n"
-        )
-
-    def get_identification(self) -> None:
-        """Prints the identification string of the device"""
         try:
-            print(self.device.query("*IDN?"))
+            self.drain_acknowledgements()
+            return self.device.query("*IDN?")
 
         # If the request is made to a device which does not support this query then handle the error
         except pyvisa.errors.VisaIOError:
@@ -64,13 +104,26 @@ class ArduinoVISADevice:
         step_value = 3.3 / steps
         return round(float(value) * step_value, 2)
 
-    def set_output_value(self, value) -> None:
+    def set_output_value(self, value, wait=True) -> None:
         """This function sets the value of the output channel on the device
 
         Args:
             value (int): value to set the output channel to, ranging from 0-1023
+            wait (bool, optional): wait for the acknowledgement of the device, if False the acknowledgement is read at the next query. Defaults to True.
         """
-        self.device.query(f"OUT:CH0 {value}")
+        if wait:
+            self.drain_acknowledgements()
+            self.device.query(f"OUT:CH0 {value}")
+        else:
+            # The device handles commands in order, so later queries still see the new output value
+            self.device.write(f"OUT:CH0 {value}")
+            self._pending_acknowledgements.append(value)
+
+    def drain_acknowledgements(self) -> None:
+        """This function reads the outstanding acknowledgements of output values sent without waiting"""
+        while self._pending_acknowledgements:
+            self.device.read()
+            self._pending_acknowledgements.pop(0)
 
     def get_output_value(self) -> int:
         """This function reads the current value on the output channel
@@ -78,6 +131,7 @@ class ArduinoVISADevice:
         Returns:
             int: current value of the output channel
         """
+        self.drain_acknowledgements()
         return self.device.query(f"OUT:CH0?")
 
     def get_input_value(self, channel) -> float:
@@ -89,6 +143,7 @@ class ArduinoVISADevice:
         Returns:
             int: digital value on the measured input channel
         """
+        self.drain_acknowledgements()
         if channel not in [1, 2]:
             print("Available channels are 1 and 2!")
         elif channel == 1:
@@ -105,6 +160,7 @@ class ArduinoVISADevice:
         Returns:
             float: analog value on the measured input channel
         """
+        self.drain_acknowledgements()
         if channel not in [1, 2]:
             print("Available channels are 1 and 2!")
         if channel == 1:
@@ -112,5 +168,67 @@ class ArduinoVISADevice:
         else:
             return self.convert_digital_analog(int(self.device.query("MEAS:CH2?")))
 
-    def close_connection(self):
-        self.device.close()
+    def measure_block(self, channels, n, window=6, raw=False) -> list:
+        """This function measures the input channels n times with pipelined queries
+
+        The queries are written back-to-back without waiting for each reply, at most window queries are outstanding
+        at a time so that the input buffer of the device does not overflow. Outstanding acknowledgements of output
+        values are read as part of the pipeline.
+
+        Args:
+            channels (list): the channels from which the values have to be read, in the order they are measured
+            n (int): number of measurements to take on every channel
+            window (int, optional): maximum number of queries sent before their reply is read. Defaults to 6.
+            raw (bool, optional): return the digital values instead of converting them to analog values. Defaults to False.
+
+        Returns:
+            list: a list for every channel containing the n analog values measured on it, or if raw is set a uint16 array of shape (channels, n) with the digital values
+        """
+        for channel in channels:
+            assert channel in [1, 2], "Available channels are 1 and 2!"
+
+        # The outstanding acknowledgements arrive before the measurements
+        acknowledgements = len(self._pending_acknowledgements)
+        self._pending_acknowledgements = []
+
+        replies = []
+        sent = acknowledgements
+        for _ in range(n):
+            for channel in channels:
+                # Make room in the window by reading the oldest outstanding reply
+                if sent - len(replies) >= window:
+                    replies.append(self.device.read())
+                self.device.write(f"MEAS:CH{channel}?")
+                sent += 1
+
+        # Read the remaining replies
+        while len(replies) < sent:
+            replies.append(self.device.read())
+
+        if raw:
+            counts = np.array(replies[acknowledgements:], dtype=np.uint16)
+            return counts.reshape(n, len(channels)).T
+
+        voltages = [
+            self.convert_digital_analog(int(reply))
+            for reply in replies[acknowledgements:]
+        ]
+        return [voltages[index :: len(channels)] for index in range(len(channels))]
+
+    def close_connection(self, discard=False):
+        """Closes the connection with the device, the session is kept open in the resource pool to be reused
+
+        Args:
+            discard (bool, optional): close the session instead of reusing it, e.g. after an error. Defaults to False.
+        """
+        if self.rm is None:
+            self.device.close()
+            return
+
+        # A session with unread replies can not be reused
+        if not discard:
+            try:
+                self.drain_acknowledgements()
+            except pyvisa.errors.VisaIOError:
+                discard = True
+        pool.release(self.port, close=discard)
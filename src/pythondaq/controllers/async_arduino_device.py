@@ -0,0 +1,286 @@
+import asyncio
+import sys
+import time
+
+import numpy as np
+from pythondaq.controllers.arduino_device import ArduinoVISADevice, VOLTAGE_LUT
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT, SimulatedArduino
+
+
+def serial_port_name(port):
+    """Converts a VISA resource name of a serial device to the name of the serial port
+
+    Args:
+        port (string): VISA resource name, e.g. ASRL/dev/ttyACM0::INSTR or ASRL3::INSTR
+
+    Returns:
+        string: name of the serial port, e.g. /dev/ttyACM0 or COM3
+    """
+    name = port.removeprefix("ASRL").removesuffix("::INSTR")
+    return f"COM{name}" if name.isdigit() else name
+
+
+class AsyncSerialTransport:
+    """Line based transport over a serial port, reading without blocking the event loop"""
+
+    def __init__(self, port, baudrate=9600) -> None:
+        """Creates an instance of the AsyncSerialTransport class and opens the serial port
+
+        Args:
+            port (string): name of the serial port
+            baudrate (int, optional): baud rate of the serial connection. Defaults to 9600.
+        """
+        import serial
+
+        self.serial = serial.Serial(port, baudrate=baudrate, timeout=0)
+        self._buffer = b""
+        self._data_received = asyncio.Event()
+
+        # Get woken up by the event loop when data arrives, if the platform supports it
+        self._loop = asyncio.get_running_loop()
+        self._use_reader = sys.platform != "win32"
+        if self._use_reader:
+            self._loop.add_reader(self.serial.fileno(), self._data_received.set)
+
+    async def write(self, message) -> None:
+        """Sends a line to the device
+
+        Args:
+            message (string): line to send, without termination
+        """
+        self.serial.write(f"{message}\n".encode())
+
+    async def readline(self) -> str:
+        """Reads the next line from the device
+
+        Returns:
+            string: line without termination
+        """
+        while b"\r\n" not in self._buffer:
+            received = self.serial.read(self.serial.in_waiting or 1)
+            if received:
+                self._buffer += received
+            elif self._use_reader:
+                self._data_received.clear()
+                await self._data_received.wait()
+            else:
+                await asyncio.sleep(0.001)
+        line, self._buffer = self._buffer.split(b"\r\n", 1)
+        return line.decode()
+
+    async def discard(self, replies, timeout) -> None:
+        """Drops the replies that are still on their way and everything that is received but not read yet
+
+        Args:
+            replies (int): number of replies which the device is expected to send
+            timeout (float): time in seconds to wait for each reply
+        """
+        # A reply is only taken from the buffer once it is complete, so the replies that are on their way are known
+        for _ in range(replies):
+            reading = asyncio.ensure_future(self.readline())
+            try:
+                done, _ = await asyncio.wait({reading}, timeout=timeout)
+            finally:
+                if not reading.done():
+                    reading.cancel()
+            if not done:
+                break
+        self._buffer = b""
+        self.serial.reset_input_buffer()
+
+    def close(self) -> None:
+        """Closes the serial port"""
+        if self._use_reader:
+            self._loop.remove_reader(self.serial.fileno())
+        self.serial.close()
+
+
+class AsyncSimulatedTransport:
+    """Line based transport to the simulated device, waiting for replies without blocking the event loop"""
+
+    def __init__(self, **simulation) -> None:
+        """Creates an instance of the AsyncSimulatedTransport class
+
+        Args:
+            **simulation: settings for the simulated device (latency, noise, ...)
+        """
+        self.device = SimulatedArduino(**simulation)
+
+    async def write(self, message) -> None:
+        """Sends a line to the simulated device
+
+        Args:
+            message (string): line to send
+        """
+        self.device.write(message)
+
+    async def readline(self) -> str:
+        """Reads the next reply of the simulated device, waiting until it has arrived
+
+        Returns:
+            string: reply of the device
+        """
+        arrival, reply = self.device.next_reply()
+        await asyncio.sleep(max(arrival - time.perf_counter(), 0))
+        return reply
+
+    async def discard(self, replies, timeout) -> None:
+        """Drops the replies that are still on their way, the simulated device knows all of them
+
+        Args:
+            replies (int): number of replies which the device is expected to send
+            timeout (float): time in seconds to wait for each reply
+        """
+        self.device.clear()
+
+    def close(self) -> None:
+        """Closes the simulated connection"""
+        self.device.close()
+
+
+class AsyncArduinoDevice:
+    """This class allows users to manage their arduino experiment controller from an asyncio event loop"""
+
+    # The conversions are the same as for the blocking device
+    convert_analog_digital = ArduinoVISADevice.convert_analog_digital
+    convert_digital_analog = ArduinoVISADevice.convert_digital_analog
+
+    def __init__(self, port, simulation=None, timeout=2.0) -> None:
+        """Creates an instance of the AsyncArduinoDevice class, the connection is made by open() or async with
+
+        Args:
+            port (string): the port of the device to connect with
+            simulation (dict, optional): settings for the simulated device (latency, noise, ...), only used when port is the simulated port. Defaults to None.
+            timeout (float, optional): time in seconds to wait for a reply. Defaults to 2.0.
+        """
+        self.port = port
+        self.simulation = simulation
+        self.timeout = timeout
+        self.transport = None
+
+        # Number of replies which are requested but not read yet
+        self._pending = 0
+
+        # Only one coroutine at a time may talk to the device, otherwise replies get mixed up
+        self._lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        """Makes the connection with the device"""
+        if self.port == SIMULATED_PORT:
+            self.transport = AsyncSimulatedTransport(**(self.simulation or {}))
+        else:
+            self.transport = AsyncSerialTransport(serial_port_name(self.port))
+        self._pending = 0
+
+    async def close(self) -> None:
+        """Closes the connection with the device"""
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    async def __aenter__(self):
+        """Opens the connection when entering an async with block"""
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Closes the connection when leaving an async with block"""
+        await self.close()
+
+    async def _read(self) -> str:
+        """Reads a reply, raises asyncio.TimeoutError if it does not arrive in time
+
+        Returns:
+            string: reply of the device
+        """
+        # asyncio.wait() is used instead of asyncio.wait_for(), which can swallow a cancellation of the scan
+        reading = asyncio.ensure_future(self.transport.readline())
+        try:
+            done, _ = await asyncio.wait({reading}, timeout=self.timeout)
+        finally:
+            if not reading.done():
+                reading.cancel()
+        if not done:
+            raise asyncio.TimeoutError(f"No reply from {self.port}")
+        reply = reading.result()
+        self._pending -= 1
+        return reply
+
+    async def _write(self, message) -> None:
+        """Sends a command of which the reply is read later with _read()
+
+        Args:
+            message (string): command to send
+        """
+        await self.transport.write(message)
+        self._pending += 1
+
+    async def discard_replies(self) -> None:
+        """Drops the replies of interrupted commands, e.g. after a timeout or a cancelled scan
+
+        Otherwise the replies that are still on their way are read as the replies to the next commands.
+        """
+        async with self._lock:
+            await self.transport.discard(self._pending, self.timeout)
+            self._pending = 0
+
+    async def query(self, message) -> str:
+        """Sends a command and waits for the reply
+
+        Args:
+            message (string): command to send
+
+        Returns:
+            string: reply of the device
+        """
+        async with self._lock:
+            await self._write(message)
+            return await self._read()
+
+    async def identify(self) -> str:
+        """Requests the identification string of the device
+
+        Returns:
+            string: identification string of the device
+        """
+        return await self.query("*IDN?")
+
+    async def set_output(self, value) -> None:
+        """Sets the value of the output channel on the device
+
+        Args:
+            value (int): value to set the output channel to, ranging from 0-1023
+        """
+        await self.query(f"OUT:CH0 {value}")
+
+    async def measure(self, channels, n, window=6) -> np.ndarray:
+        """Measures the input channels n times with pipelined queries
+
+        Args:
+            channels (list): the channels from which the values have to be read, in the order they are measured
+            n (int): number of measurements to take on every channel
+            window (int, optional): maximum number of queries sent before their reply is read. Defaults to 6.
+
+        Returns:
+            np.ndarray: array of shape (channels, n) with the analog values measured on every channel
+        """
+        for channel in channels:
+            assert channel in [1, 2], "Available channels are 1 and 2!"
+
+        replies = []
+        async with self._lock:
+            sent = 0
+            for _ in range(n):
+                for channel in channels:
+                    # Make room in the window by reading the oldest outstanding reply
+                    if sent - len(replies) >= window:
+                        replies.append(await self._read())
+                    await self._write(f"MEAS:CH{channel}?")
+                    sent += 1
+
+            # Read the remaining replies
+            while len(replies) < sent:
+                replies.append(await self._read())
+
+        counts = np.array(replies, dtype=np.uint16).reshape(n, len(channels)).T
+        return VOLTAGE_LUT[counts]
@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+from os import makedirs, path
+
+from pythondaq.controllers.arduino_device import list_devices
+from pythondaq.controllers.resource_pool import pool
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT, SimulatedArduino
+
+# File where the identification of every port is stored after a discovery
+CACHE_PATH = path.join(path.expanduser("~"), ".cache", "pythondaq", "devices.json")
+
+# Given instead of the identification for a port that is in use, e.g. by a scan, so it can not be probed
+IN_USE = "in use"
+
+
+def probe_device(port, timeout=2.0):
+    """This function requests the identification string of the device at a port
+
+    Args:
+        port (string): the port of the device
+        timeout (float, optional): time in seconds to wait for the reply. Defaults to 2.0.
+
+    Returns:
+        string: identification string of the device, IN_USE if the port is in use, None if the device does not respond
+    """
+    if port == SIMULATED_PORT:
+        return SimulatedArduino.identification
+
+    # A device that is in use responds to its user, so it is not reported as not responding
+    try:
+        device = pool.acquire(port)
+    except AssertionError:
+        return IN_USE
+    except Exception:
+        return None
+
+    try:
+        original_timeout = device.timeout
+        device.timeout = timeout * 1000
+        try:
+            identification = device.query("*IDN?")
+        finally:
+            device.timeout = original_timeout
+
+    # Devices which do not respond are not kept open
+    except Exception:
+        pool.release(port, close=True)
+        return None
+
+    pool.release(port)
+    return identification
+
+
+def discover_devices(timeout=2.0, cache_path=CACHE_PATH) -> dict:
+    """This function probes all connected devices at the same time and stores the results on disk
+
+    Args:
+        timeout (float, optional): time in seconds to wait for the reply of each device. Defaults to 2.0.
+        cache_path (string, optional): file where the identifications are stored, None to not store them. Defaults to CACHE_PATH.
+
+    Returns:
+        dict: identification string of every port, IN_USE for ports that are in use, None for ports without a responding device
+    """
+    ports = list_devices(refresh=True)
+
+    # Probing is mostly waiting, so every port gets its own thread
+    with ThreadPoolExecutor(max_workers=max(len(ports), 1)) as executor:
+        identifications = dict(
+            zip(ports, executor.map(lambda port: probe_device(port, timeout), ports))
+        )
+
+    if cache_path:
+        makedirs(path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w") as file:
+            json.dump(
+                {
+                    "discovered": datetime.now().isoformat(),
+                    "devices": identifications,
+                },
+                file,
+                indent=2,
+            )
+    return identifications
+
+
+def load_identifications(cache_path=CACHE_PATH) -> dict:
+    """This function reads the identifications stored by the last discovery
+
+    Args:
+        cache_path (string, optional): file where the identifications are stored. Defaults to CACHE_PATH.
+
+    Returns:
+        dict: identification string of every port, empty if no discovery was done
+    """
+    try:
+        with open(cache_path) as file:
+            return json.load(file)["devices"]
+    except (OSError, ValueError, KeyError):
+        return {}
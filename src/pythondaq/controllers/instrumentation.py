@@ -0,0 +1,534 @@
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+import json
+from os import getpid, makedirs, path
+import threading
+import time
+
+# Files where the metrics of the last scan are stored, as JSON and in the Prometheus text format
+METRICS_PATH = path.join(path.expanduser("~"), ".cache", "pythondaq", "metrics.json")
+PROMETHEUS_PATH = path.splitext(METRICS_PATH)[0] + ".prom"
+
+# Upper bounds in seconds of the histogram buckets, the last bucket has no upper bound
+BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+# Phases of a voltage step
+PHASES = ("set", "measure", "compute")
+
+
+def command_name(message) -> str:
+    """This function gives the command of a message without its value, e.g. OUT:CH0 for OUT:CH0 512
+
+    Args:
+        message (string): the message sent to the device
+
+    Returns:
+        string: the command
+    """
+    return message.split(" ", 1)[0]
+
+
+class Histogram:
+    """This class counts observations in buckets with fixed upper bounds, like a Prometheus histogram"""
+
+    def __init__(self, bounds=BUCKETS) -> None:
+        """Creates an instance of the Histogram class
+
+        Args:
+            bounds (tuple, optional): sorted upper bounds of the buckets in seconds. Defaults to BUCKETS.
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value) -> None:
+        """Adds an observation
+
+        Args:
+            value (float): the observed duration in seconds
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q) -> float:
+        """Estimates a quantile as the upper bound of the bucket which contains it
+
+        Args:
+            q (float): the quantile, between 0 and 1
+
+        Returns:
+            float: upper bound of the bucket, infinity for the last bucket and nan without observations
+        """
+        if not self.count:
+            return float("nan")
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        """Gives the histogram as a dict for JSON"""
+        return {
+            "bounds": list(self.bounds),
+            "counts": self.counts,
+            "count": self.count,
+            "sum": self.sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Makes a histogram from the dict of to_dict()"""
+        histogram = cls(tuple(data["bounds"]))
+        histogram.counts = data["counts"]
+        histogram.count = data["count"]
+        histogram.sum = data["sum"]
+        return histogram
+
+
+class ScanMetrics:
+    """This class collects the latency of every device command and the duration of every phase of the voltage steps
+
+    Collecting is opt-in, a scan without a ScanMetrics object does not measure anything.
+    """
+
+    def __init__(self, port=None) -> None:
+        """Creates an instance of the ScanMetrics class
+
+        Args:
+            port (string, optional): port of the scanned device, used as label. Defaults to None.
+        """
+        self.port = port
+        self.commands = {}
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.errors = {}
+        self.timeouts = {}
+        self.steps = 0
+
+    def observe_command(self, command, latency) -> None:
+        """Adds the time between sending a command and reading its reply
+
+        Args:
+            command (string): the command, e.g. MEAS:CH1?
+            latency (float): the time in seconds
+        """
+        if command not in self.commands:
+            self.commands[command] = Histogram()
+        self.commands[command].observe(latency)
+
+    def count_error(self, command, error) -> None:
+        """Counts a failed command, timeouts are counted separately
+
+        Args:
+            command (string): the command
+            error (Exception): the error raised by the device
+        """
+        # pyvisa is imported here, so reading stored metrics does not need it
+        import pyvisa
+
+        timeout = (
+            isinstance(error, pyvisa.errors.VisaIOError)
+            and error.error_code == pyvisa.constants.StatusCode.error_timeout
+        )
+        counter = self.timeouts if timeout else self.errors
+        counter[command] = counter.get(command, 0) + 1
+
+    def observe_step(self, set_time, measure_time, compute_time) -> None:
+        """Adds the durations of the phases of a voltage step
+
+        Args:
+            set_time (float): time in seconds to set the output
+            measure_time (float): time in seconds to take the samples
+            compute_time (float): time in seconds to store the results
+        """
+        self.phases["set"].observe(set_time)
+        self.phases["measure"].observe(measure_time)
+        self.phases["compute"].observe(compute_time)
+        self.steps += 1
+
+    def to_dict(self) -> dict:
+        """Gives the metrics as a dict for JSON"""
+        return {
+            "port": self.port,
+            "steps": self.steps,
+            "commands": {
+                command: histogram.to_dict()
+                for command, histogram in self.commands.items()
+            },
+            "phases": {
+                phase: histogram.to_dict() for phase, histogram in self.phases.items()
+            },
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Makes metrics from the dict of to_dict()"""
+        metrics = cls(data["port"])
+        metrics.steps = data["steps"]
+        metrics.commands = {
+            command: Histogram.from_dict(histogram)
+            for command, histogram in data["commands"].items()
+        }
+        metrics.phases = {
+            phase: Histogram.from_dict(histogram)
+            for phase, histogram in data["phases"].items()
+        }
+        metrics.errors = data["errors"]
+        metrics.timeouts = data["timeouts"]
+        return metrics
+
+
+class InstrumentedResource:
+    """This class wraps a device resource and records the latency of every command in a ScanMetrics object
+
+    Pipelined commands are matched with their replies in the order they are sent, so the latency of a command
+    is the time from writing it to reading its reply.
+    """
+
+    def __init__(self, resource, metrics) -> None:
+        """Creates an instance of the InstrumentedResource class
+
+        Args:
+            resource (object): pyvisa(-like) resource to wrap
+            metrics (ScanMetrics): the metrics to record in
+        """
+        self.resource = resource
+        self.metrics = metrics
+        self._sent = deque()
+
+    def __getattr__(self, name):
+        """Passes all other attributes on to the wrapped resource"""
+        return getattr(self.resource, name)
+
+    def write(self, message):
+        """Writes a command and remembers when it was sent"""
+        command = command_name(message)
+        try:
+            result = self.resource.write(message)
+        except Exception as err:
+            self.metrics.count_error(command, err)
+            raise
+        self._sent.append((command, time.perf_counter()))
+        return result
+
+    def read(self):
+        """Reads the reply of the oldest command that is not answered yet"""
+        command, sent = self._sent.popleft() if self._sent else (None, None)
+        try:
+            reply = self.resource.read()
+        except Exception as err:
+            self.metrics.count_error(command or "read", err)
+            raise
+        if command is not None:
+            self.metrics.observe_command(command, time.perf_counter() - sent)
+        return reply
+
+    def query(self, message):
+        """Writes a command and reads its reply"""
+        command = command_name(message)
+        start = time.perf_counter()
+        try:
+            reply = self.resource.query(message)
+        except Exception as err:
+            self.metrics.count_error(command, err)
+            raise
+        self.metrics.observe_command(command, time.perf_counter() - start)
+        return reply
+
+
+def prometheus_text(scans) -> str:
+    """This function formats metrics in the Prometheus text format
+
+    Args:
+        scans (list): the ScanMetrics of every scanned device
+
+    Returns:
+        string: the metrics, one sample per line
+    """
+    lines = []
+
+    def histogram_lines(name, labels, histogram):
+        seen = 0
+        for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+            seen += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {seen}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum!r}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+    lines.append(
+        "# HELP pythondaq_command_latency_seconds Time from sending a command to reading its reply"
+    )
+    lines.append("# TYPE pythondaq_command_latency_seconds histogram")
+    for metrics in scans:
+        for command, histogram in sorted(metrics.commands.items()):
+            labels = f'port="{metrics.port}",command="{command}"'
+            histogram_lines("pythondaq_command_latency_seconds", labels, histogram)
+
+    lines.append(
+        "# HELP pythondaq_step_phase_seconds Duration of the set, measure and compute phase of a voltage step"
+    )
+    lines.append("# TYPE pythondaq_step_phase_seconds histogram")
+    for metrics in scans:
+        for phase, histogram in metrics.phases.items():
+            labels = f'port="{metrics.port}",phase="{phase}"'
+            histogram_lines("pythondaq_step_phase_seconds", labels, histogram)
+
+    for name, attribute, description in (
+        ("pythondaq_command_errors_total", "errors", "Commands that failed"),
+        ("pythondaq_command_timeouts_total", "timeouts", "Commands that timed out"),
+    ):
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} counter")
+        for metrics in scans:
+            for command, count in sorted(getattr(metrics, attribute).items()):
+                lines.append(
+                    f'{name}{{port="{metrics.port}",command="{command}"}} {count}'
+                )
+    return "\n".join(lines) + "\n"
+
+
+def save_metrics(scans, json_path=METRICS_PATH, prometheus_path=PROMETHEUS_PATH):
+    """This function stores metrics as JSON and in the Prometheus text format
+
+    Args:
+        scans (list): the ScanMetrics of every scanned device
+        json_path (string, optional): path of the JSON file. Defaults to METRICS_PATH.
+        prometheus_path (string, optional): path of the Prometheus text file, None to not write it. Defaults to PROMETHEUS_PATH.
+    """
+    makedirs(path.dirname(path.abspath(json_path)), exist_ok=True)
+    with open(json_path, "w") as file:
+        json.dump(
+            {
+                "created": datetime.now().isoformat(),
+                "scans": [metrics.to_dict() for metrics in scans],
+            },
+            file,
+            indent=2,
+        )
+    if prometheus_path:
+        makedirs(path.dirname(path.abspath(prometheus_path)), exist_ok=True)
+        with open(prometheus_path, "w") as file:
+            file.write(prometheus_text(scans))
+
+
+def load_metrics(json_path=METRICS_PATH) -> tuple:
+    """This function reads metrics stored by save_metrics()
+
+    Args:
+        json_path (string, optional): path of the JSON file. Defaults to METRICS_PATH.
+
+    Returns:
+        tuple: the time the metrics were stored and the ScanMetrics of every scanned device
+    """
+    with open(json_path) as file:
+        data = json.load(file)
+    return data["created"], [ScanMetrics.from_dict(scan) for scan in data["scans"]]
+
+
+class Tracer:
+    """This class records a timeline of spans, which is saved in the Chrome trace-event format
+
+    The trace can be opened in chrome://tracing or https://ui.perfetto.dev. Spans of different threads are shown on
+    their own row, spans of the same thread are nested by time.
+    """
+
+    def __init__(self) -> None:
+        """Creates an instance of the Tracer class, the timeline starts now"""
+        self.events = []
+        self._origin = time.perf_counter()
+        self._threads = set()
+
+    def add_span(self, name, start, end, category="scan", **args) -> None:
+        """Adds a span which is timed already
+
+        Args:
+            name (string): name of the span
+            start (float): time.perf_counter() time at which the span starts
+            end (float): time.perf_counter() time at which the span ends
+            category (string, optional): category of the span, e.g. device or storage. Defaults to "scan".
+            **args: extra information shown with the span
+        """
+        thread = threading.current_thread()
+        if thread.ident not in self._threads:
+            self._threads.add(thread.ident)
+            self.events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": getpid(),
+                    "tid": thread.ident,
+                    "args": {"name": thread.name},
+                }
+            )
+        self.events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": getpid(),
+                "tid": thread.ident,
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def span(self, name, category="scan", **args):
+        """Records the time spent in a with block as a span
+
+        Args:
+            name (string): name of the span
+            category (string, optional): category of the span. Defaults to "scan".
+            **args: extra information shown with the span
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter(), category, **args)
+
+    def iterate(self, iterable, name, category="scan"):
+        """Records the time spent getting every item of an iterable, e.g. to time the rendering of a progress bar
+
+        Args:
+            iterable (iterable): the iterable to go through
+            name (string): name of the spans
+            category (string, optional): category of the spans. Defaults to "scan".
+
+        Yields:
+            object: the items of the iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_span(name, start, time.perf_counter(), category)
+                return
+            self.add_span(name, start, time.perf_counter(), category)
+            yield item
+
+    def save(self, trace_path) -> None:
+        """Saves the timeline as Chrome trace-event JSON
+
+        Args:
+            trace_path (string): path of the JSON file
+        """
+        with open(trace_path, "w") as file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, file)
+
+
+def span(tracer, name, category="scan", **args):
+    """This function gives the span context manager of a tracer, or a context manager which does nothing without tracer
+
+    Args:
+        tracer (Tracer): the tracer, or None when nothing is traced
+        name (string): name of the span
+        category (string, optional): category of the span. Defaults to "scan".
+        **args: extra information shown with the span
+
+    Returns:
+        object: a context manager
+    """
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name, category, **args)
+
+
+class TracedResource:
+    """This class wraps a device resource and adds every write, read and query to the timeline of a Tracer"""
+
+    def __init__(self, resource, tracer) -> None:
+        """Creates an instance of the TracedResource class
+
+        Args:
+            resource (object): pyvisa(-like) resource to wrap
+            tracer (Tracer): the tracer to add the spans to
+        """
+        self.resource = resource
+        self.tracer = tracer
+        self._sent = deque()
+
+    def __getattr__(self, name):
+        """Passes all other attributes on to the wrapped resource"""
+        return getattr(self.resource, name)
+
+    def write(self, message):
+        """Writes a command"""
+        command = command_name(message)
+        self._sent.append(command)
+        with self.tracer.span(f"write {command}", "device"):
+            return self.resource.write(message)
+
+    def read(self):
+        """Reads the reply of the oldest command that is not answered yet"""
+        command = self._sent.popleft() if self._sent else ""
+        with self.tracer.span(f"read {command}".strip(), "device"):
+            return self.resource.read()
+
+    def query(self, message):
+        """Writes a command and reads its reply"""
+        with self.tracer.span(f"query {command_name(message)}", "device"):
+            return self.resource.query(message)
+
+
+@contextmanager
+def profiling(trace_path=None, stats_path=None):
+    """This function profiles a with block, with a timeline of spans and with cProfile
+
+    cProfile only profiles the thread which runs the with block, the timeline shows the spans of all threads.
+
+    Args:
+        trace_path (string, optional): path of the Chrome trace-event JSON file, nothing is traced if None. Defaults to None.
+        stats_path (string, optional): path of the cProfile stats file, which can be read with pstats, cProfile is not used if None. Defaults to None.
+
+    Yields:
+        Tracer: the tracer to add the spans to, None if nothing is traced
+    """
+    tracer = Tracer() if trace_path else None
+    profiler = None
+    if stats_path:
+        # cProfile is only imported when profiling
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield tracer
+
+    # The profile of a failed run is saved too, it shows where it failed
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(stats_path)
+        if tracer is not None:
+            tracer.save(trace_path)
@@ -0,0 +1,112 @@
+import atexit
+import threading
+import time
+
+import pyvisa
+
+
+class ResourcePool:
+    """This class shares one pyvisa ResourceManager in the process, caches the device list and reuses open sessions"""
+
+    def __init__(self, ttl=5.0) -> None:
+        """Creates an instance of the ResourcePool class, the ResourceManager is only made when it is needed
+
+        Args:
+            ttl (float, optional): time in seconds that the list of connected devices is reused. Defaults to 5.0.
+        """
+        self.ttl = ttl
+        self._resource_manager = None
+        self._resources = None
+        self._listed_at = 0.0
+
+        # Open sessions by port, and the ports of the sessions that are in use
+        self._sessions = {}
+        self._in_use = set()
+
+        # The pool is shared between scan threads
+        self._lock = threading.RLock()
+
+    @property
+    def resource_manager(self) -> pyvisa.ResourceManager:
+        """The shared pyvisa ResourceManager"""
+        with self._lock:
+            if self._resource_manager is None:
+                self._resource_manager = pyvisa.ResourceManager("@py")
+            return self._resource_manager
+
+    def list_resources(self, refresh=False) -> tuple:
+        """Lists the connected devices, probing the ports only if the cached list is older than the ttl
+
+        Args:
+            refresh (bool, optional): probe the ports even if the cached list is still valid. Defaults to False.
+
+        Returns:
+            tuple: the ports of the connected devices
+        """
+        with self._lock:
+            if (
+                refresh
+                or self._resources is None
+                or time.monotonic() - self._listed_at > self.ttl
+            ):
+                self._resources = self.resource_manager.list_resources()
+                self._listed_at = time.monotonic()
+            return self._resources
+
+    def acquire(self, port):
+        """Gets a session with the device at a port, an open session is reused
+
+        Args:
+            port (string): the port of the device
+
+        Returns:
+            pyvisa.resources.MessageBasedResource: the session with the device
+        """
+        with self._lock:
+            assert port not in self._in_use, f"The device at {port} is already in use"
+            self._in_use.add(port)
+            session = self._sessions.get(port)
+            resource_manager = self.resource_manager
+        if session is not None:
+            return session
+
+        # Opening a port can take seconds, the port is reserved so other threads can use the pool meanwhile
+        try:
+            session = resource_manager.open_resource(
+                port, read_termination="\r\n", write_termination="\n"
+            )
+        except BaseException:
+            with self._lock:
+                self._in_use.discard(port)
+            raise
+        with self._lock:
+            self._sessions[port] = session
+        return session
+
+    def release(self, port, close=False) -> None:
+        """Gives a session back to the pool so it can be reused
+
+        Args:
+            port (string): the port of the device
+            close (bool, optional): close the session instead of keeping it open, e.g. after an error. Defaults to False.
+        """
+        with self._lock:
+            self._in_use.discard(port)
+            if close and port in self._sessions:
+                self._sessions.pop(port).close()
+
+    def close_all(self) -> None:
+        """Closes all sessions and the ResourceManager"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+            self._in_use = set()
+            if self._resource_manager is not None:
+                self._resource_manager.close()
+                self._resource_manager = None
+
+
+# The pool shared by the whole process
+pool = ResourcePool()
+atexit.register(pool.close_all)
@@ -0,0 +1,174 @@
+import math
+import random
+import time
+
+import pyvisa
+
+# Port name under which the simulated device is listed and can be opened
+SIMULATED_PORT = "SIM::INSTR"
+
+
+class SimulatedArduino:
+    """This class mimics an arduino experiment controller running the VISA firmware.
+
+    The simulated circuit is an LED in series with a resistor. The output channel (CH0) drives the circuit,
+    channel 1 measures the total voltage and channel 2 the voltage across the resistor. Measurements are
+    quantized by a 10-bit ADC, like on the real device.
+    """
+
+    identification = "Arduino VISA firmware v1.0.0 (simulated)"
+
+    def __init__(
+        self,
+        latency=0.0,
+        noise=1.0,
+        resistor_load=220,
+        saturation_current=2e-10,
+        thermal_voltage=0.16,
+        seed=None,
+    ) -> None:
+        """Creates an instance of the SimulatedArduino class
+
+        Args:
+            latency (float, optional): round-trip time of a single query in seconds. Defaults to 0.0.
+            noise (float, optional): standard deviation of the measurement noise in ADC counts. Defaults to 1.0.
+            resistor_load (int, optional): resistance of the resistor in the circuit in ohm. Defaults to 220.
+            saturation_current (float, optional): saturation current of the LED in ampere. Defaults to 2e-10.
+            thermal_voltage (float, optional): ideality factor times thermal voltage of the LED in volt. Defaults to 0.16.
+            seed (int, optional): seed for the noise generator, to make runs reproducible. Defaults to None.
+        """
+        self.latency = latency
+        self.noise = noise
+        self.resistor_load = resistor_load
+        self.saturation_current = saturation_current
+        self.thermal_voltage = thermal_voltage
+        self.random = random.Random(seed)
+
+        # Mimic the attributes of a pyvisa resource
+        self.timeout = 2000
+        self.read_termination = "\r\n"
+        self.write_termination = "\n"
+
+        # Replies which are written but not yet read, with the time at which they arrive
+        self._replies = []
+        self._last_arrival = 0.0
+
+        self._output_value = 0
+        self._circuit = (0.0, 0.0)
+
+    def solve_circuit(self, voltage) -> tuple:
+        """Solves the LED and resistor circuit for a given supply voltage
+
+        Args:
+            voltage (float): voltage over the LED and resistor in volt
+
+        Returns:
+            tuple: total voltage and the voltage across the resistor in volt
+        """
+        # Bisect on the LED voltage, the current through LED and resistor has to be equal
+        low, high = 0.0, voltage
+        for _ in range(50):
+            led_volt = (low + high) / 2
+            led_current = self.saturation_current * (
+                math.exp(led_volt / self.thermal_voltage) - 1
+            )
+            resistor_current = (voltage - led_volt) / self.resistor_load
+            if led_current > resistor_current:
+                high = led_volt
+            else:
+                low = led_volt
+        return voltage, voltage - led_volt
+
+    def _adc(self, voltage) -> int:
+        """Converts a voltage into noisy 10-bit ADC counts
+
+        Args:
+            voltage (float): voltage on the input channel
+
+        Returns:
+            int: digital value between 0 - 1023
+        """
+        counts = voltage / 3.3 * 1023
+        if self.noise:
+            counts += self.random.gauss(0, self.noise)
+        return min(max(round(counts), 0), 1023)
+
+    def _handle(self, message) -> str:
+        """Returns the reply of the firmware to a single command
+
+        Args:
+            message (string): command sent to the device
+
+        Returns:
+            string: reply of the device
+        """
+        command = message.strip()
+        if command == "*IDN?":
+            return self.identification
+        if command == "OUT:CH0?":
+            return str(self._output_value)
+        if command.startswith("OUT:CH0 "):
+            value = min(max(int(command[8:]), 0), 1023)
+            self._output_value = value
+            self._circuit = self.solve_circuit(value * 3.3 / 1023)
+            return str(value)
+        if command == "MEAS:CH0?":
+            return str(self._output_value)
+        if command == "MEAS:CH1?":
+            return str(self._adc(self._circuit[0]))
+        if command == "MEAS:CH2?":
+            return str(self._adc(self._circuit[1]))
+        return f"ERROR: UNKNOWN COMMAND {command}"
+
+    def write(self, message) -> None:
+        """Sends a command to the simulated device
+
+        Args:
+            message (string): command to send
+        """
+        # Replies arrive one latency after sending, but never before an earlier reply
+        arrival = max(time.perf_counter() + self.latency, self._last_arrival)
+        self._last_arrival = arrival
+        self._replies.append((arrival, self._handle(message)))
+
+    def next_reply(self) -> tuple:
+        """Takes the oldest outstanding reply without waiting for it to arrive
+
+        Returns:
+            tuple: the time.perf_counter() time at which the reply arrives and the reply
+        """
+        if not self._replies:
+            raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_timeout)
+        return self._replies.pop(0)
+
+    def read(self) -> str:
+        """Reads the oldest outstanding reply, waiting until it has arrived
+
+        Returns:
+            string: reply of the device
+        """
+        arrival, reply = self.next_reply()
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return reply
+
+    def query(self, message) -> str:
+        """Sends a command and waits for the reply
+
+        Args:
+            message (string): command to send
+
+        Returns:
+            string: reply of the device
+        """
+        self.write(message)
+        return self.read()
+
+    def clear(self) -> None:
+        """Drops the outstanding replies, like clearing the buffers of a real device"""
+        self._replies = []
+
+    def close(self) -> None:
+        """Closes the simulated connection"""
+        self.clear()
@@ -0,0 +1,251 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import math
+from os import listdir, makedirs, path
+
+import numpy as np
+from pythondaq.models.columnar import INDEX_FILE, load_columns
+
+# File where the fit results are stored by the hash of the data file
+CACHE_PATH = path.join(path.expanduser("~"), ".cache", "pythondaq", "analysis.json")
+
+# Thermal voltage kT/q at 300 K in volt
+THERMAL_VOLTAGE = 0.025852
+
+# Step of the analog to digital converter in volt, its rounding adds a variance of a step squared over 12
+ADC_STEP = 3.3 / 1023
+
+# A fit with a larger reduced chi squared does not describe the curve within its errors
+MAX_REDUCED_CHI_SQUARED = 5.0
+
+# Number of standard errors a parameter may lie outside its physical range before the fit is flagged
+MAX_DEVIATION = 2.0
+
+# Columns of the summary table, in order
+RESULT_COLUMNS = [
+    "saturation_current",
+    "saturation_current_error",
+    "ideality_factor",
+    "ideality_factor_error",
+    "series_resistance",
+    "series_resistance_error",
+    "reduced_chi_squared",
+    "points",
+    "quality",
+]
+
+
+def fit_shockley(
+    voltages,
+    voltage_errors,
+    currents,
+    current_errors,
+    min_fraction=0.05,
+    iterations=5,
+) -> dict:
+    """This function fits the Shockley diode equation with a series resistance to a U,I-curve
+
+    For currents well above the saturation current the equation V = n V_T ln(I / I_s) + I R_s is linear in
+    n V_T, n V_T ln(I_s) and R_s, so it is solved with weighted linear least squares. The errors of the current
+    are added to the voltage errors with the slope of the curve, which is updated every iteration.
+
+    Args:
+        voltages (np.ndarray): voltages over the LED
+        voltage_errors (np.ndarray): errors of the voltages
+        currents (np.ndarray): currents through the LED
+        current_errors (np.ndarray): errors of the currents
+        min_fraction (float, optional): only points with a current above this fraction of the largest current are used, below it the current is offset and noise of the ADC. Defaults to 0.05.
+        iterations (int, optional): number of times the weights are updated with the fitted slope. Defaults to 5.
+
+    Returns:
+        dict: the fitted parameters with their errors, the reduced chi squared, the number of points used and the quality of the fit
+    """
+    voltages, voltage_errors, currents, current_errors = (
+        np.asarray(column, dtype=np.float64)
+        for column in (voltages, voltage_errors, currents, current_errors)
+    )
+
+    # Only points where the LED conducts follow the equation
+    used = currents > min_fraction * currents.max(initial=0)
+    voltages, voltage_errors = voltages[used], voltage_errors[used]
+    currents, current_errors = currents[used], current_errors[used]
+    assert len(currents) > 3, "Not enough points with a current to fit"
+
+    design = np.column_stack([np.log(currents), np.ones_like(currents), currents])
+    parameters = np.zeros(3)
+    for _ in range(iterations):
+        slope = parameters[0] / currents + parameters[2]
+        variances = voltage_errors**2 + (slope * current_errors) ** 2 + ADC_STEP**2 / 12
+        weights = 1 / variances
+        covariance = np.linalg.inv(design.T @ (design * weights[:, None]))
+        parameters = covariance @ (design.T @ (weights * voltages))
+
+    slope_factor, offset, series_resistance = parameters
+    assert slope_factor > 0, "The current does not rise with the voltage"
+    residuals = voltages - design @ parameters
+    degrees_of_freedom = max(len(voltages) - 3, 1)
+
+    # ln(I_s) = -offset / (n V_T), its error follows from the covariance of both parameters
+    gradient = np.array([offset / slope_factor**2, -1 / slope_factor, 0])
+    log_saturation_current = -offset / slope_factor
+    log_saturation_current_error = math.sqrt(max(gradient @ covariance @ gradient, 0))
+    result = {
+        "saturation_current": math.exp(log_saturation_current),
+        "saturation_current_error": math.exp(log_saturation_current)
+        * log_saturation_current_error,
+        "ideality_factor": float(slope_factor / THERMAL_VOLTAGE),
+        "ideality_factor_error": math.sqrt(covariance[0, 0]) / THERMAL_VOLTAGE,
+        "series_resistance": float(series_resistance),
+        "series_resistance_error": math.sqrt(covariance[2, 2]),
+        "reduced_chi_squared": float(weights @ residuals**2) / degrees_of_freedom,
+        "points": int(len(voltages)),
+    }
+    result["quality"] = "; ".join(fit_problems(result)) or "ok"
+    return result
+
+
+def fit_problems(result) -> list:
+    """This function checks whether fitted parameters are physically possible and whether the fit describes the curve
+
+    A parameter is only flagged when it lies more than MAX_DEVIATION standard errors outside its physical range, a
+    series resistance of -0.2 ± 0.3 Ohm is just a resistance close to zero.
+
+    Args:
+        result (dict): the fit results of fit_shockley()
+
+    Returns:
+        list: descriptions of the problems that are found, empty for a good fit
+    """
+    problems = []
+    if result["series_resistance"] < -MAX_DEVIATION * result["series_resistance_error"]:
+        problems.append("negative series resistance")
+    if result["ideality_factor"] < 1 - MAX_DEVIATION * result["ideality_factor_error"]:
+        problems.append("ideality factor below 1")
+    if result["reduced_chi_squared"] > MAX_REDUCED_CHI_SQUARED:
+        problems.append(
+            f"bad fit, reduced chi squared {result['reduced_chi_squared']:.1f} > {MAX_REDUCED_CHI_SQUARED:g}"
+        )
+    return problems
+
+
+def file_hash(data_path) -> str:
+    """This function gives the hash of the contents of a CSV file or a column directory
+
+    Args:
+        data_path (string): path of the CSV file or the column directory
+
+    Returns:
+        string: SHA-256 hash as hexadecimal string
+    """
+    digest = hashlib.sha256()
+    if path.isdir(data_path):
+        file_paths = [path.join(data_path, name) for name in sorted(listdir(data_path))]
+    else:
+        file_paths = [data_path]
+    for file_path in file_paths:
+        with open(file_path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def analyze_file(data_path) -> dict:
+    """This function fits the curve of one run, errors are returned instead of raised so one bad run does not stop the others
+
+    Args:
+        data_path (string): path of the CSV file or the column directory
+
+    Returns:
+        dict: the fit results, or the error message as "error"
+    """
+    try:
+        columns = load_columns(data_path)
+        return fit_shockley(
+            columns["led_voltages"],
+            columns["led_voltages_errors"],
+            columns["currents"],
+            columns["currents_errors"],
+        )
+    except (
+        AssertionError,
+        KeyError,
+        ValueError,
+        OSError,
+        np.linalg.LinAlgError,
+    ) as err:
+        return {"error": f"{type(err).__name__}: {err}"}
+
+
+def find_runs(directory) -> list:
+    """This function lists the runs in a data store, a run saved in both formats is only listed as column directory
+
+    Args:
+        directory (string): directory of the data store
+
+    Returns:
+        list: paths of the CSV files and column directories
+    """
+    names = set(listdir(directory))
+    runs = []
+    for name in sorted(names):
+        full_path = path.join(directory, name)
+        if path.isfile(path.join(full_path, INDEX_FILE)):
+            runs.append(full_path)
+        elif name.endswith(".csv") and path.splitext(name)[0] not in names:
+            runs.append(full_path)
+    return runs
+
+
+def analyze(data_paths, cache_path=CACHE_PATH, workers=None) -> list:
+    """This function fits the curves of many runs in a process pool, runs that were fitted before are taken from the cache
+
+    Args:
+        data_paths (list): paths of CSV files or column directories
+        cache_path (string, optional): file where the fit results are stored by file hash, None to not use a cache. Defaults to CACHE_PATH.
+        workers (int, optional): number of processes, the number of CPUs if not given. Defaults to None.
+
+    Returns:
+        list: a dict with the path, the hash and the fit results of every run
+    """
+    cache = {}
+    if cache_path:
+        try:
+            with open(cache_path) as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            pass
+
+    # Fits without a quality check are made by an older version, and errors were cached by it as well
+    cache = {digest: result for digest, result in cache.items() if "quality" in result}
+
+    hashes = [file_hash(data_path) for data_path in data_paths]
+    new_paths = {
+        digest: data_path
+        for digest, data_path in zip(hashes, data_paths)
+        if digest not in cache
+    }
+
+    # Fitting is CPU bound, so every process fits its own runs
+    fitted = {}
+    if new_paths:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            fitted.update(
+                zip(new_paths, executor.map(analyze_file, new_paths.values()))
+            )
+
+        # Errors can be temporary, like a file that is still being written, so they are not cached and tried again
+        cache.update(
+            (digest, result)
+            for digest, result in fitted.items()
+            if "error" not in result
+        )
+        if cache_path:
+            makedirs(path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, "w") as file:
+                json.dump(cache, file)
+
+    results = {**cache, **fitted}
+    return [
+        {"path": data_path, "hash": digest, **results[digest]}
+        for digest, data_path in zip(hashes, data_paths)
+    ]
@@ -0,0 +1,206 @@
+from datetime import datetime
+from os import listdir, path
+import re
+import sqlite3
+
+# Name of the data files that were saved before the catalog existed, e.g. ExperimentData_12.csv
+LEGACY_FILE_NAME = re.compile(r"ExperimentData_(\d+)\.csv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    port TEXT,
+    start REAL,
+    stop REAL,
+    resistor_load REAL,
+    sample_size INTEGER,
+    target_error REAL,
+    points INTEGER,
+    status TEXT NOT NULL,
+    file_name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_port ON runs (port, sample_size);
+CREATE INDEX IF NOT EXISTS runs_sample_size ON runs (sample_size);
+"""
+
+
+class ExperimentCatalog:
+    """This class keeps an index of the experiments in a data store, so runs can be found without reading their files
+
+    The index is a SQLite database in the data store. Every run gets its number from the database, so two
+    processes saving at the same time never get the same number. Data files that were saved before the catalog
+    existed are added when the catalog is created.
+    """
+
+    def __init__(self, directory, file_name="catalog.sqlite") -> None:
+        """Creates an instance of the ExperimentCatalog class and opens or creates the index
+
+        Args:
+            directory (string): directory of the data store
+            file_name (string, optional): name of the index file in the data store. Defaults to "catalog.sqlite".
+        """
+        self.directory = directory
+        catalog_path = path.join(directory, file_name)
+        created = not path.exists(catalog_path)
+
+        # Autocommit mode, transactions are started explicitly where they are needed
+        self.connection = sqlite3.connect(
+            catalog_path, timeout=30, isolation_level=None
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        if created:
+            self.import_directory()
+
+    def import_directory(self) -> int:
+        """Adds the data files of the data store that are not in the catalog yet
+
+        Numbered data files keep their number, other CSV files get the next free number. Only the number of points
+        is known of these runs, the other columns are left empty.
+
+        Returns:
+            int: number of runs that were added
+        """
+        # The catalog is read inside the transaction, so no other process takes the numbers in the meantime
+        with self._transaction():
+            rows = self.connection.execute("SELECT id, file_name FROM runs").fetchall()
+            known = {row["file_name"] for row in rows}
+            used = {row["id"] for row in rows}
+            new_files = [
+                file_name
+                for file_name in listdir(self.directory)
+                if file_name.endswith(".csv") and file_name not in known
+            ]
+
+            # Numbered files first, so the other files do not take their numbers
+            numbers = {}
+            for file_name in new_files:
+                match = LEGACY_FILE_NAME.fullmatch(file_name)
+                if match and int(match.group(1)) not in used:
+                    numbers[file_name] = int(match.group(1))
+                else:
+                    numbers[file_name] = None
+            new_files.sort(
+                key=lambda file_name: (
+                    numbers[file_name] is None,
+                    numbers[file_name] or 0,
+                    file_name,
+                )
+            )
+
+            for file_name in new_files:
+                file_path = path.join(self.directory, file_name)
+                with open(file_path) as file:
+                    # Some old files repeat the header before every row
+                    header_line = file.readline()
+                    points = sum(
+                        1 for line in file if line.strip() and line != header_line
+                    )
+                self.connection.execute(
+                    "INSERT INTO runs (id, created, points, status, file_name) VALUES (?, ?, ?, 'finished', ?)",
+                    (
+                        numbers[file_name],
+                        datetime.fromtimestamp(path.getmtime(file_path)).isoformat(),
+                        points,
+                        file_name,
+                    ),
+                )
+        return len(new_files)
+
+    def add_run(
+        self, port, start, stop, resistor_load, sample_size, target_error=None
+    ) -> tuple:
+        """Registers a new run and gives it the next free number
+
+        Args:
+            port (string): port of the device
+            start (float): analog voltage at which the scan starts
+            stop (float): analog voltage at which the scan stops
+            resistor_load (float): resistance of the resistor in the circuit
+            sample_size (int): number of samples per voltage
+            target_error (float, optional): target standard error of adaptive sampling. Defaults to None.
+
+        Returns:
+            tuple: the number of the run and the path of its data file
+        """
+        with self._transaction():
+            run_id = self.connection.execute(
+                "INSERT INTO runs (created, port, start, stop, resistor_load, sample_size, target_error, status, file_name) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 'running', '')",
+                (
+                    datetime.now().isoformat(),
+                    port,
+                    start,
+                    stop,
+                    resistor_load,
+                    sample_size,
+                    target_error,
+                ),
+            ).lastrowid
+            file_name = f"ExperimentData_{run_id}.csv"
+            self.connection.execute(
+                "UPDATE runs SET file_name = ? WHERE id = ?", (file_name, run_id)
+            )
+        return run_id, path.join(self.directory, file_name)
+
+    def finish_run(self, run_id, points, status="finished") -> None:
+        """Stores the result of a run
+
+        Args:
+            run_id (int): number of the run
+            points (int): number of points that were measured
+            status (string, optional): "finished", or "failed" if the scan was stopped by an error. Defaults to "finished".
+        """
+        self.connection.execute(
+            "UPDATE runs SET points = ?, status = ? WHERE id = ?",
+            (points, status, run_id),
+        )
+
+    def find(self, port=None, min_sample_size=None, status=None) -> list:
+        """Finds the runs that match all given conditions, in the order they were made
+
+        Args:
+            port (string, optional): only runs on this device, partial ports are matched. Defaults to None.
+            min_sample_size (int, optional): only runs with at least this sample size. Defaults to None.
+            status (string, optional): only runs with this status. Defaults to None.
+
+        Returns:
+            list: a dict with the columns of every matching run, the path of the data file is added as "path"
+        """
+        conditions, parameters = [], []
+        if port is not None:
+            # Wildcards in the port are matched literally
+            conditions.append("port LIKE ? ESCAPE '\\'")
+            escaped = re.sub(r"([\\%_])", r"\\\1", port)
+            parameters.append(f"%{escaped}%")
+        if min_sample_size is not None:
+            conditions.append("sample_size >= ?")
+            parameters.append(min_sample_size)
+        if status is not None:
+            conditions.append("status = ?")
+            parameters.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        return [
+            {**row, "path": path.join(self.directory, row["file_name"])}
+            for row in map(
+                dict,
+                self.connection.execute(
+                    f"SELECT * FROM runs {where} ORDER BY id", parameters
+                ),
+            )
+        ]
+
+    def close(self) -> None:
+        """Closes the index"""
+        self.connection.close()
+
+    def _transaction(self):
+        """Starts a transaction which locks the index for writing until it is finished
+
+        Returns:
+            sqlite3.Connection: the connection, to use in a with block which commits or rolls back the transaction
+        """
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
@@ -0,0 +1,236 @@
+import csv
+import json
+from os import listdir, makedirs, path, replace
+import re
+import shutil
+
+import numpy as np
+from pythondaq.models.data_format import DATA_DTYPE, HEADERS
+
+# Name of the file in a column directory which lists the columns, it is written last
+INDEX_FILE = "columns.json"
+
+# File names of the columns of known headers, including the headers of files saved by the GUI
+COLUMN_NAMES = {
+    **dict(zip(HEADERS, DATA_DTYPE.names)),
+    "Volt (V)": "led_voltages",
+    "Volt error (V)": "led_voltages_errors",
+    "Current error (A)": "currents_errors",
+}
+
+
+def column_name(header) -> str:
+    """This function gives the name under which the column with a header is stored
+
+    Args:
+        header (string): header of the column, e.g. "LED voltage (V)"
+
+    Returns:
+        string: name of the column, e.g. led_voltages
+    """
+    if header in COLUMN_NAMES:
+        return COLUMN_NAMES[header]
+    return re.sub(r"[^a-z0-9]+", "_", header.lower()).strip("_") or "column"
+
+
+def save_columns(directory, headers, columns) -> None:
+    """This function stores columns as a directory with a NPY file for every column
+
+    The directory is written next to its final place and then moved there, so readers never see half a run.
+
+    Args:
+        directory (string): path of the column directory, an existing directory is replaced
+        headers (list): the headers of the columns
+        columns (list): an array with the values of every column
+    """
+    names = [column_name(header) for header in headers]
+    assert len(set(names)) == len(names), f"Columns with the same name: {names}"
+
+    partial = f"{directory}.partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    makedirs(partial)
+    for name, values in zip(names, columns):
+        np.save(path.join(partial, f"{name}.npy"), np.asarray(values, dtype=np.float64))
+    with open(path.join(partial, INDEX_FILE), "w") as file:
+        json.dump({"headers": list(headers), "names": names}, file)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    replace(partial, directory)
+
+
+class ColumnStore:
+    """This class reads a column directory, every column is memory-mapped when it is first used
+
+    Reading a column does not parse or copy the data, the operating system loads the pages that are used.
+    """
+
+    def __init__(self, directory) -> None:
+        """Creates an instance of the ColumnStore class, only the list of columns is read
+
+        Args:
+            directory (string): path of the column directory
+        """
+        self.directory = directory
+        with open(path.join(directory, INDEX_FILE)) as file:
+            index = json.load(file)
+        self.headers = index["headers"]
+        self.names = index["names"]
+        self._columns = {}
+
+    def __getitem__(self, name) -> np.ndarray:
+        """Gives a read-only memory-mapped array of a column
+
+        Args:
+            name (string): name of the column, e.g. currents
+
+        Returns:
+            np.ndarray: the values of the column
+        """
+        if name not in self._columns:
+            assert name in self.names, f"{self.directory} has no column {name}"
+            self._columns[name] = np.load(
+                path.join(self.directory, f"{name}.npy"), mmap_mode="r"
+            )
+        return self._columns[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self.names
+
+    def __len__(self) -> int:
+        """The number of points, 0 if there are no columns"""
+        return len(self[self.names[0]]) if self.names else 0
+
+
+def convert_csv(csv_path, directory=None, force=False) -> str:
+    """This function converts a CSV file to a column directory
+
+    Args:
+        csv_path (string): path of the CSV file
+        directory (string, optional): path of the column directory, the CSV path without extension if not given. Defaults to None.
+        force (bool, optional): also convert when the column directory is newer than the CSV file. Defaults to False.
+
+    Returns:
+        string: path of the column directory
+    """
+    if directory is None:
+        directory = path.splitext(csv_path)[0]
+    if (
+        not force
+        and path.exists(path.join(directory, INDEX_FILE))
+        and path.getmtime(directory) >= path.getmtime(csv_path)
+    ):
+        return directory
+
+    headers, values = read_csv(csv_path)
+    save_columns(directory, headers, values.T)
+    return directory
+
+
+def read_csv(csv_path) -> tuple:
+    """This function reads a CSV file of a run
+
+    Args:
+        csv_path (string): path of the CSV file
+
+    Returns:
+        tuple: the headers and an array of shape (points, columns) with the values
+    """
+    with open(csv_path, newline="") as file:
+        header_line = file.readline()
+        headers = next(csv.reader([header_line]), [])
+        # Some old files repeat the header before every row
+        lines = [line for line in file if line.strip() and line != header_line]
+    values = (
+        np.loadtxt(lines, delimiter=",", ndmin=2)
+        if lines
+        else np.empty((0, len(headers)))
+    )
+    return headers, values
+
+
+def load_columns(data_path) -> dict:
+    """This function gives the columns of a run saved as CSV file or as column directory
+
+    Args:
+        data_path (string): path of the CSV file or the column directory
+
+    Returns:
+        dict: the values of every column by column name, memory-mapped for a column directory
+    """
+    if path.isdir(data_path):
+        store = ColumnStore(data_path)
+        return {name: store[name] for name in store.names}
+    headers, values = read_csv(data_path)
+    return {column_name(header): values[:, i] for i, header in enumerate(headers)}
+
+
+def convert_directory(
+    directory, pattern=r"ExperimentData_.*\.csv", force=False
+) -> list:
+    """This function converts all CSV files of a data store that are not converted yet
+
+    Args:
+        directory (string): directory of the data store
+        pattern (string, optional): regular expression which the names of the CSV files match. Defaults to r"ExperimentData_.*\\.csv".
+        force (bool, optional): also convert files which are already converted. Defaults to False.
+
+    Returns:
+        list: paths of the column directories
+    """
+    return [
+        convert_csv(path.join(directory, file_name), force=force)
+        for file_name in sorted(listdir(directory))
+        if re.fullmatch(pattern, file_name)
+    ]
+
+
+class ColumnSink:
+    """This class stores the points of a scan as a column directory when the scan has finished
+
+    A scan has at most 1024 points, so the rows are kept in memory and written at once. When a scan fails the
+    rows that are measured are still written.
+    """
+
+    def __init__(self, directory) -> None:
+        """Creates an instance of the ColumnSink class
+
+        Args:
+            directory (string): path of the column directory, an existing directory is replaced
+        """
+        self.directory = directory
+        self.headers = None
+        self._rows = []
+
+    def start(self, headers) -> None:
+        """Remembers the headers and empties the buffer
+
+        Args:
+            headers (list): the column names
+        """
+        self.headers = headers
+        self._rows = []
+
+    def write(self, rows) -> None:
+        """Adds rows to the buffer
+
+        Args:
+            rows (np.ndarray): structured array with the new rows
+        """
+        self._rows.append(rows.copy())
+
+    def finish(self, order=None) -> None:
+        """Writes the columns
+
+        Args:
+            order (np.ndarray, optional): indices of the rows in the order in which they are written. Defaults to None.
+        """
+        if self.headers is None:
+            return
+        rows = np.concatenate(self._rows) if self._rows else np.empty(0, DATA_DTYPE)
+        if order is not None:
+            rows = rows[order]
+        save_columns(
+            self.directory, self.headers, [rows[name] for name in rows.dtype.names]
+        )
+        self.headers = None
+        self._rows = []
@@ -0,0 +1,52 @@
+import numpy as np
+
+# Columns of the experiment data, in the order of the headers
+DATA_DTYPE = np.dtype(
+    [
+        ("total_voltages", np.float64),
+        ("total_voltages_errors", np.float64),
+        ("resistor_voltages", np.float64),
+        ("resistor_voltages_errors", np.float64),
+        ("led_voltages", np.float64),
+        ("led_voltages_errors", np.float64),
+        ("currents", np.float64),
+        ("currents_errors", np.float64),
+        ("resistor_loads", np.float64),
+    ]
+)
+HEADERS = [
+    "Total voltage (V)",
+    "Total V error",
+    "Resistor Voltage (V)",
+    "Resistor V error",
+    "LED voltage (V)",
+    "LED V error",
+    "Current (A)",
+    "Current error",
+    "Resistor load (Ohm)",
+]
+
+
+def check_snapshot(rows) -> list:
+    """This function checks a snapshot of the experiment data for columns of different lengths and incomplete rows
+
+    Args:
+        rows (np.ndarray): the snapshot, a structured array with the fields of DATA_DTYPE
+
+    Returns:
+        list: descriptions of the problems that are found
+    """
+    problems = []
+    if any(len(rows[name]) != len(rows) for name in rows.dtype.names):
+        problems.append("columns with different lengths")
+    if (rows["resistor_loads"] == 0).any():
+        problems.append("rows without resistor load")
+    if not np.allclose(
+        rows["currents"], rows["resistor_voltages"] / rows["resistor_loads"]
+    ):
+        problems.append("rows without calculated current")
+    if not np.allclose(
+        rows["led_voltages"], rows["total_voltages"] - rows["resistor_voltages"]
+    ):
+        problems.append("rows without calculated LED voltage")
+    return problems
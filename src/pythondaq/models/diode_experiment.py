@@ -1,19 +1,76 @@
-from pythondaq.controllers.arduino_device import list_devices, ArduinoVISADevice
+from pythondaq.controllers.arduino_device import (
+    list_devices,
+    ArduinoVISADevice,
+    VOLTAGE_LUT,
+)
+from pythondaq.controllers.discovery import discover_devices, load_identifications
+from pythondaq.controllers.instrumentation import span
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT
+from pythondaq.models.data_format import DATA_DTYPE, HEADERS
+from pythondaq.models.journal import ScanJournal
+from pythondaq.models.monitor import MONITOR_CAPACITY, MonitorBuffer
+from pythondaq.models.observers import ScanObserver
+from pythondaq.models.running_statistics import RunningStatistics
 import numpy as np
-from rich.progress import track
+import bisect
+import heapq
+import math
 import threading
+import time
 
 
 class DiodeExperiment:
     """This class allows users to run their diode experiment"""
 
-    def __init__(self) -> None:
-        """Creates an instance of the DiodeExperiment class and runs the clear()-method to initialize the lists where data is stored."""
+    def __init__(self, simulation=None) -> None:
+        """Creates an instance of the DiodeExperiment class and runs the clear()-method to initialize the buffer where data is stored.
+
+        Args:
+            simulation (dict, optional): settings for the simulated device (latency, noise, ...), used when scanning the simulated port. Defaults to None.
+        """
+        self.simulation = simulation
+
+        # Increases every time the stored data changes, so readers can skip work when nothing changed
+        self.generation = 0
         self.clear()
 
+        # Port of the device of the last scan, identifies the results
+        self.port = None
+
+        # Estimate of the time per step saved by deferred output writes, set by scan()
+        self.time_saved_per_step = None
+
+        # Number of queries saved by adaptive sampling compared to fixed sampling, set by scan()
+        self.queries_saved = None
+
         # Make an Event to lock the scan method
         self.is_scanning = threading.Event()
 
+        # Sinks which receive every completed point during a scan
+        self.sinks = []
+
+        # Observers which are called back on the events of a scan
+        self.observers = []
+
+        # ScanMetrics which records the timing of the commands and steps of a scan, nothing is recorded if None
+        self.metrics = None
+
+        # Tracer which records a timeline of the scan, nothing is traced if None
+        self.tracer = None
+
+        # Steps from the journal of an interrupted scan, set by resume()
+        self._resume_steps = None
+
+        # Monitor file of the running monitoring run, None when not monitoring. It is closed when the run ends, so
+        # other threads read the file with their own MonitorBuffer
+        self.monitor_buffer = None
+
+        # Error which stopped the last monitoring run, None if it did not fail, it is set before is_scanning is cleared
+        self.monitor_error = None
+
+        # Make an Event to stop monitoring
+        self._stop_monitoring = threading.Event()
+
     def device_info(self, port):
         """Gets the identification string of the device
 
@@ -23,20 +80,60 @@ class DiodeExperiment:
         Returns:
             string: identification string of device at requested port
         """
-        device = ArduinoVISADevice(port=port)
+        device = ArduinoVISADevice(port=port, simulation=self.simulation)
         identification = device.get_identification()
         device.close_connection()
         return identification
 
-    def get_connected_devices(self):
+    def get_connected_devices(self, refresh=False, include_simulated=False):
         """Lists connected devices
 
+        Args:
+            refresh (bool, optional): probe the ports again instead of using the cached device list. Defaults to False.
+            include_simulated (bool, optional): add the port of the simulated device to the list. Defaults to False.
+
         Returns:
             list: a list containing the ports of the connected devices
         """
-        return list_devices()
+        return list_devices(refresh=refresh, include_simulated=include_simulated)
+
+    def discover_devices(self, timeout=2.0):
+        """Requests the identification string of all connected devices at the same time, the results are stored on disk
+
+        Args:
+            timeout (float, optional): time in seconds to wait for the reply of each device. Defaults to 2.0.
+
+        Returns:
+            dict: identification string of every port, "in use" for ports that are in use, None for ports without a responding device
+        """
+        return discover_devices(timeout=timeout)
+
+    def known_devices(self):
+        """Gets the ports with a responding device from the last discovery, without probing the ports
 
-    def start_scan(self, port, start=0.0, stop=3.3, resistor_load=220, sample_size=5):
+        Returns:
+            dict: identification string of every port where a real device responded
+        """
+        return {
+            port: identification
+            for port, identification in load_identifications().items()
+            if identification and port != SIMULATED_PORT
+        }
+
+    def start_scan(
+        self,
+        port,
+        start=0.0,
+        stop=3.3,
+        resistor_load=220,
+        sample_size=5,
+        deferred_output=False,
+        raw=False,
+        target_error=None,
+        min_samples=2,
+        max_points=None,
+        coarse_step=32,
+    ):
         """Function that runs the scan method as a seperate thread
 
         Args:
@@ -45,15 +142,48 @@ class DiodeExperiment:
             stop (float, optional): analog voltage at which the experiment stops. Defaults to 3.3.
             resistor_load (int, optional): resistance of the resistor in the experiment in ohm. Defaults to 220.
             sample_size (int, optional): number of samples to take at each volatage level. Defaults to 5.
+            deferred_output (bool, optional): send output values without waiting for their acknowledgement. Defaults to False.
+            raw (bool, optional): store the digital values of the samples and convert them when the data is read. Defaults to False.
+            target_error (float, optional): sample each voltage level until the standard error of both channels is at most this value in volt, sample_size is then the maximum. Defaults to None.
+            min_samples (int, optional): number of samples to take at each voltage level before checking the target error. Defaults to 2.
+            max_points (int, optional): measure at most this many voltage levels, refined where the curve changes most. Defaults to None.
+            coarse_step (int, optional): step in digital values of the first pass of a refined scan. Defaults to 32.
         """
         self._scan_thread = threading.Thread(
             target=self.scan,
-            args=(port, start, stop, resistor_load, sample_size),
+            kwargs={
+                "port": port,
+                "start": start,
+                "stop": stop,
+                "resistor_load": resistor_load,
+                "sample_size": sample_size,
+                "deferred_output": deferred_output,
+                "raw": raw,
+                "target_error": target_error,
+                "min_samples": min_samples,
+                "max_points": max_points,
+                "coarse_step": coarse_step,
+            },
         )
         self._scan_thread.start()
 
     # Method to start an experiment
-    def scan(self, port, start, stop, resistor_load, sample_size) -> tuple:
+    def scan(
+        self,
+        port,
+        start=0.0,
+        stop=3.3,
+        resistor_load=220,
+        sample_size=5,
+        deferred_output=False,
+        raw=False,
+        target_error=None,
+        min_samples=2,
+        max_points=None,
+        coarse_step=32,
+        progress=None,
+        journal=None,
+    ) -> tuple:
         """Function to start an experiment with the diode and store the results of the experiment
 
         Args:
@@ -62,77 +192,742 @@ class DiodeExperiment:
             stop (float, optional): analog voltage at which the experiment stops. Defaults to 3.3.
             resistor_load (int, optional): resistance of the resistor in the experiment in ohm. Defaults to 220.
             sample_size (int, optional): number of samples to take at each volatage level. Defaults to 5.
+            deferred_output (bool, optional): send output values without waiting for their acknowledgement, the acknowledgement is read together with the measurements. Defaults to False.
+            raw (bool, optional): store the digital values of the samples and only convert them to voltages when the data is read. Defaults to False.
+            target_error (float, optional): sample each voltage level until the standard error of both channels is at most this value in volt, sample_size is then the maximum. Defaults to None.
+            min_samples (int, optional): number of samples to take at each voltage level before checking the target error. Defaults to 2.
+            max_points (int, optional): measure at most this many voltage levels. The scan starts with a coarse pass and then refines the intervals where the curve bends most, around the knee, the results are sorted by voltage. Defaults to None.
+            coarse_step (int, optional): step in digital values of the coarse pass of a refined scan. Defaults to 32.
+            progress (rich.progress.Progress, optional): shared progress display to add this scan to, instead of showing its own progress bar. Defaults to None.
+            journal (string, optional): path of a journal file in which the configuration and every completed step are recorded, so the scan can be resumed with resume(). Defaults to None.
 
         Returns:
-            tuple: tuple object containing a list of headers and a zip object containing the lists with the experiment data
+            tuple: tuple object containing a list of headers and a structured array view on the experiment data
         """
+        assert not (
+            raw and target_error is not None
+        ), "Raw mode needs the same number of samples at each voltage level"
+        assert (
+            target_error is None or target_error > 0
+        ), "The target error has to be positive"
+        assert max_points is None or max_points > 1, "A scan needs at least two points"
+        assert (
+            journal is None or max_points is None
+        ), "Coarse-to-fine scans can not be journaled"
+        config = {
+            "port": port,
+            "start": start,
+            "stop": stop,
+            "resistor_load": resistor_load,
+            "sample_size": sample_size,
+            "deferred_output": deferred_output,
+            "raw": raw,
+            "target_error": target_error,
+            "min_samples": min_samples,
+        }
+
         # Update threading Event
         self.is_scanning.set()
 
         # Make sure to clear the old results first
         self.clear()
+        self.port = port
+        completed_steps = self._resume_steps or []
+        self._resume_steps = None
 
         # connect with the controller
-        device = ArduinoVISADevice(port=port)
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.port = port
+        tracer = self.tracer
+        try:
+            device = ArduinoVISADevice(
+                port=port, simulation=self.simulation, metrics=metrics, tracer=tracer
+            )
+        except BaseException as err:
+            self.is_scanning.clear()
+            self._notify_finished(err)
+            raise
+        scan_journal = None
 
-        # start / stop are given in analog, convert this to digital first
-        start_digital = device.convert_analog_digital(start)
-        stop_digital = device.convert_analog_digital(stop)
+        try:
+            self._start_sinks()
 
-        # scan across the given experiment range
-        for output_val in track(
-            range(start_digital, stop_digital + 1), description="Running experiment..."
-        ):
-            device.set_output_value(value=output_val)
+            # start / stop are given in analog, convert this to digital first
+            start_digital = device.convert_analog_digital(start)
+            stop_digital = device.convert_analog_digital(stop)
 
-            measurement_total_volt = []
-            measurement_resistor_volt = []
-            # Take measurements (take a few to determine the error)
-            for _ in range(sample_size):
-                measurement_total_volt.append(device.get_input_voltage(channel=1))
-                measurement_resistor_volt.append(device.get_input_voltage(channel=2))
+            # Either step through every digital value or refine a coarse scan
+            steps = stop_digital - start_digital + 1
+            if max_points is None:
+                output_values = range(start_digital, stop_digital + 1)
+            else:
+                steps = min(steps, max_points)
+                currents = {}
+                output_values = self._refined_output_values(
+                    start_digital, stop_digital, max_points, coarse_step, currents
+                )
 
-            # Calculate the total volt and resister volt by taking the mean of the sample
-            total_volt = np.mean(measurement_total_volt)
-            resistor_volt = np.mean(measurement_resistor_volt)
+            # The number of steps is known, so allocate the buffer once
+            self.reserve(steps)
+            if raw:
+                self.counts = np.zeros((steps, 2, sample_size), dtype=np.uint16)
 
-            # Note standard error = standard deviation / sqrt(sample_size), if sample_size is 1 no errors can be determined
-            total_volt_error = (
-                np.std(measurement_total_volt) / np.sqrt(sample_size)
-                if sample_size > 1
-                else 0
+            # Time spent setting the output value at each step
+            output_times = []
+
+            # Number of samples taken on each channel
+            samples_taken = 0
+
+            # Output value of every stored row
+            measured_values = []
+
+            # Restore the steps of an interrupted scan and continue after the last one
+            for step in completed_steps:
+                measured_values.append(step["output_value"])
+                if raw:
+                    self.add_counts(
+                        resistor_load, np.array(step["counts"], dtype=np.uint16)
+                    )
+                else:
+                    samples_taken += step["samples"]
+                    self.add_measurement(resistor_load, *step["values"])
+            if completed_steps:
+                output_values = range(
+                    completed_steps[-1]["output_value"] + 1, stop_digital + 1
+                )
+                steps = len(output_values)
+            self._push_rows()
+
+            if journal is not None:
+                scan_journal = ScanJournal(journal)
+                if completed_steps:
+                    scan_journal.reopen()
+                else:
+                    scan_journal.start(config)
+
+            # Show the progress on a shared display when scanning multiple devices
+            if progress is None:
+                # rich is only imported when scanning, it takes a large part of the start-up time of the CLI
+                from rich.progress import track
+
+                output_values = track(
+                    output_values, total=steps, description="Running experiment..."
+                )
+            else:
+                output_values = progress.track(
+                    output_values, total=steps, description=f"Scanning {port}..."
+                )
+
+            # Rendering the progress bar happens when the next step is taken
+            if tracer is not None:
+                output_values = tracer.iterate(output_values, "progress", "progress")
+
+            # scan across the given experiment range
+            for output_val in output_values:
+                measured_values.append(output_val)
+
+                output_start = time.perf_counter()
+                device.set_output_value(value=output_val, wait=not deferred_output)
+                measure_start = time.perf_counter()
+                output_times.append(measure_start - output_start)
+
+                # In raw mode the digital values are stored as they are, the statistics are calculated when the data is read
+                if raw:
+                    counts = device.measure_block(
+                        channels=[1, 2], n=sample_size, raw=True
+                    )
+                    compute_start = time.perf_counter()
+                    self.add_counts(resistor_load, counts)
+                    if max_points is not None:
+                        currents[output_val] = (
+                            VOLTAGE_LUT[counts[1]].mean() / resistor_load
+                        )
+                    storage_start = time.perf_counter()
+                    if scan_journal is not None:
+                        scan_journal.record(output_val, counts=counts.tolist())
+
+                else:
+                    # Take measurements (take a few to determine the error)
+                    total_volt, resistor_volt = self._measure_step(
+                        device, sample_size, target_error, min_samples
+                    )
+                    compute_start = time.perf_counter()
+                    samples_taken += total_volt.count
+
+                    # save the mean and standard error of the measurement
+                    self.add_measurement(
+                        resistor_load,
+                        total_volt.mean,
+                        resistor_volt.mean,
+                        total_volt.standard_error,
+                        resistor_volt.standard_error,
+                    )
+                    if max_points is not None:
+                        currents[output_val] = resistor_volt.mean / resistor_load
+                    storage_start = time.perf_counter()
+                    if scan_journal is not None:
+                        scan_journal.record(
+                            output_val,
+                            values=[
+                                total_volt.mean,
+                                resistor_volt.mean,
+                                total_volt.standard_error,
+                                resistor_volt.standard_error,
+                            ],
+                            samples=total_volt.count,
+                        )
+
+                # Stream the completed point to the sinks
+                self._push_rows()
+
+                # The phases are timed anyway, they are only recorded when asked for
+                if metrics is not None or tracer is not None:
+                    step_end = time.perf_counter()
+                if metrics is not None:
+                    metrics.observe_step(
+                        measure_start - output_start,
+                        compute_start - measure_start,
+                        step_end - compute_start,
+                    )
+                if tracer is not None:
+                    tracer.add_span("step", output_start, step_end, value=output_val)
+                    tracer.add_span("set output", output_start, measure_start, "device")
+                    tracer.add_span("measure", measure_start, compute_start, "device")
+                    tracer.add_span(
+                        "statistics", compute_start, storage_start, "statistics"
+                    )
+                    tracer.add_span("storage", storage_start, step_end, "storage")
+
+            self.queries_saved = (
+                2 * (len(measured_values) * sample_size - samples_taken)
+                if target_error is not None
+                else None
             )
-            resistor_volt_error = (
-                np.std(measurement_resistor_volt) / np.sqrt(sample_size)
-                if sample_size > 1
-                else 0
+
+            # A refined scan measures out of order, the sinks got the points in that order and sort them when they finish
+            order = (
+                np.argsort(measured_values, kind="stable")
+                if max_points is not None
+                else None
             )
+            with span(tracer, "finish storage", "storage"):
+                self._finish_sinks(order)
+                if scan_journal is not None:
+                    scan_journal.finish()
 
-            # save the measurement
-            self.add_measurement(
-                resistor_load,
-                total_volt,
-                resistor_volt,
-                total_volt_error,
-                resistor_volt_error,
+            # Sort the stored rows by voltage as well
+            if order is not None:
+                self._sort_rows(order)
+
+            # After the experiment we turn the LED off, this waits for the acknowledgement so its time is the reference
+            output_start = time.perf_counter()
+            device.set_output_value(value=0)
+            self.time_saved_per_step = (
+                time.perf_counter() - output_start - np.mean(output_times)
+                if deferred_output and output_times
+                else None
             )
-        # After the experiment we turn the LED off
-        device.set_output_value(value=0)
+
+        # The session can hold replies of the failed scan, so it is not reused
+        except BaseException as err:
+            self._finish_sinks()
+            if scan_journal is not None:
+                scan_journal.close()
+            device.close_connection(discard=True)
+            self.is_scanning.clear()
+            self._notify_finished(err)
+            raise
 
         # After experiment we close the connection to the controller
         device.close_connection()
 
         # Update threading Event
         self.is_scanning.clear()
+        self._notify_finished()
+
+        # Return the experiment data
+        return self.export_experiment_data()
+
+    def resume(self, journal, port=None, progress=None) -> tuple:
+        """Function to continue an interrupted scan from its journal
+
+        The completed steps are read from the journal and the scan continues after the last one, with the same
+        configuration. The new steps are added to the journal. The results are the same as those of a scan that
+        was not interrupted.
+
+        Args:
+            journal (string): path of the journal file of the interrupted scan
+            port (string, optional): port of the device, if it is connected to another port than before. Defaults to None.
+            progress (rich.progress.Progress, optional): shared progress display to add this scan to. Defaults to None.
+
+        Returns:
+            tuple: tuple object containing a list of headers and a structured array view on the experiment data
+        """
+        config, steps, _ = ScanJournal.read(journal)
+        if port is not None:
+            config["port"] = port
+        self._resume_steps = steps
+        return self.scan(**config, progress=progress, journal=journal)
+
+    def monitor(
+        self,
+        port,
+        voltage,
+        file_path,
+        capacity=MONITOR_CAPACITY,
+        resistor_load=220,
+        duration=None,
+        block_size=32,
+    ) -> int:
+        """Function to hold the output at a fixed voltage and sample both channels continuously, e.g. to study drift
+
+        The samples are taken with pipelined queries, as fast as the device can answer them, and are written to a
+        ring buffer file which other processes can read while monitoring. Monitoring stops after the duration or when
+        stop_monitoring() is called, the LED is turned off at the end.
+
+        Args:
+            port (string): port of the device controlling the experiment
+            voltage (float): analog voltage at which the output is held
+            file_path (string): path of the monitor file, an existing file is replaced
+            capacity (int, optional): number of samples the monitor file holds, the oldest samples are overwritten when it is full. Defaults to MONITOR_CAPACITY.
+            resistor_load (int, optional): resistance of the resistor in the experiment in ohm. Defaults to 220.
+            duration (float, optional): time in seconds to monitor, until stop_monitoring() is called if None. Defaults to None.
+            block_size (int, optional): number of samples per channel that are queried back-to-back and written to the file at once. Defaults to 32.
+
+        Returns:
+            int: number of samples taken
+        """
+        assert 0 < block_size <= capacity, "A block has to fit in the monitor file"
+
+        # Update threading Event
+        self.monitor_error = None
+        self.is_scanning.set()
+
+        # The error is stored before is_scanning is cleared, so a run that has ended always shows whether it failed
+        try:
+            device = ArduinoVISADevice(
+                port=port, simulation=self.simulation, metrics=self.metrics
+            )
+        except BaseException as err:
+            self.monitor_error = err
+            self._stop_monitoring.clear()
+            self.is_scanning.clear()
+            raise
+
+        samples_taken = 0
+        buffer = None
+        try:
+            output_value = device.convert_analog_digital(voltage)
+            started = time.time()
+            buffer = MonitorBuffer(
+                file_path,
+                capacity=capacity,
+                output_value=output_value,
+                resistor_load=resistor_load,
+                started=started,
+            )
+            self.monitor_buffer = buffer
+            device.set_output_value(value=output_value)
+
+            while not self._stop_monitoring.is_set() and (
+                duration is None or time.time() - started < duration
+            ):
+                # The replies of a block are read together, so the samples are spread evenly over the time of the block
+                block_start = time.time()
+                counts = device.measure_block(channels=[1, 2], n=block_size, raw=True)
+                block_end = time.time()
+                times = block_start + (block_end - block_start) * (
+                    np.arange(1, block_size + 1) / block_size
+                )
+                buffer.append(times, counts)
+                samples_taken += block_size
+
+            # After monitoring we turn the LED off
+            device.set_output_value(value=0)
+
+        # The session can hold replies of the failed run, so it is not reused
+        except BaseException as err:
+            self.monitor_error = err
+            device.close_connection(discard=True)
+            raise
+        else:
+            # After monitoring we close the connection to the controller
+            device.close_connection()
+
+        # The file is closed, so a next run can replace it, readers open the file themselves
+        finally:
+            self.monitor_buffer = None
+            if buffer is not None:
+                buffer.close()
+            self._stop_monitoring.clear()
+            self.is_scanning.clear()
+        return samples_taken
+
+    def start_monitor(self, port, voltage, file_path, **monitor_options):
+        """Function that runs the monitor method as a seperate thread, an error is stored in monitor_error
+
+        Args:
+            port (string): port of the device controlling the experiment
+            voltage (float): analog voltage at which the output is held
+            file_path (string): path of the monitor file
+            **monitor_options: options passed on to monitor(), like capacity and duration
+        """
+        self.monitor_error = None
+        self._stop_monitoring.clear()
+
+        def run():
+            try:
+                self.monitor(port, voltage, file_path, **monitor_options)
+            except Exception:
+                # monitor() has stored the error already
+                pass
+
+        # Set here already, so is_scanning shows the run while the thread starts
+        self.is_scanning.set()
+        self._monitor_thread = threading.Thread(target=run)
+        self._monitor_thread.start()
+
+    def wait_for_monitor(self) -> None:
+        """Function that waits until the monitoring run started by start_monitor() has ended"""
+        self._monitor_thread.join()
+
+    def stop_monitoring(self) -> None:
+        """Function that stops the running monitoring run after the block of samples that is being taken"""
+        self._stop_monitoring.set()
+
+    async def scan_async(
+        self,
+        port,
+        start=0.0,
+        stop=3.3,
+        resistor_load=220,
+        sample_size=5,
+        timeout=2.0,
+    ) -> tuple:
+        """Function to run an experiment from an asyncio event loop, the results are stored like scan() does
+
+        Scans of several devices can run in one event loop with asyncio.gather(), and a scan can be limited with
+        asyncio.wait_for() or cancelled. The LED is turned off when the scan ends, also when it is cancelled.
+
+        Args:
+            port (string): port of the device controlling the experiment
+            start (float, optional): analog voltage at which the experiment starts. Defaults to 0.0.
+            stop (float, optional): analog voltage at which the experiment stops. Defaults to 3.3.
+            resistor_load (int, optional): resistance of the resistor in the experiment in ohm. Defaults to 220.
+            sample_size (int, optional): number of samples to take at each volatage level. Defaults to 5.
+            timeout (float, optional): time in seconds to wait for a reply of the device. Defaults to 2.0.
+
+        Returns:
+            tuple: tuple object containing a list of headers and a structured array view on the experiment data
+        """
+        # asyncio is only imported by the programs that use it
+        from pythondaq.controllers.async_arduino_device import AsyncArduinoDevice
+
+        # Update threading Event
+        self.is_scanning.set()
+
+        # Make sure to clear the old results first
+        self.clear()
+        self.port = port
+
+        try:
+            async with AsyncArduinoDevice(
+                port, simulation=self.simulation, timeout=timeout
+            ) as device:
+                # start / stop are given in analog, convert this to digital first
+                start_digital = device.convert_analog_digital(start)
+                stop_digital = device.convert_analog_digital(stop)
+                self.reserve(stop_digital - start_digital + 1)
+                self._start_sinks()
+
+                try:
+                    for output_val in range(start_digital, stop_digital + 1):
+                        await device.set_output(output_val)
+
+                        # Take measurements (take a few to determine the error)
+                        total_volt, resistor_volt = (
+                            RunningStatistics(),
+                            RunningStatistics(),
+                        )
+                        samples = await device.measure(channels=[1, 2], n=sample_size)
+                        total_volt.add(samples[0])
+                        resistor_volt.add(samples[1])
+
+                        # save the mean and standard error of the measurement
+                        self.add_measurement(
+                            resistor_load,
+                            total_volt.mean,
+                            resistor_volt.mean,
+                            total_volt.standard_error,
+                            resistor_volt.standard_error,
+                        )
+
+                        # Stream the completed point to the sinks
+                        self._push_rows()
+                except BaseException:
+                    self._finish_sinks()
+
+                    # Replies of an interrupted step are dropped, so they are not read as the acknowledgement
+                    # of turning the LED off, and a failure to turn it off does not hide the error of the scan
+                    try:
+                        await device.discard_replies()
+                        await device.set_output(0)
+                    except Exception:
+                        pass
+                    raise
+                else:
+                    self._finish_sinks()
+
+                    # After the experiment we turn the LED off
+                    await device.set_output(0)
+        except BaseException as err:
+            self.is_scanning.clear()
+            self._notify_finished(err)
+            raise
+
+        # Update threading Event
+        self.is_scanning.clear()
+        self._notify_finished()
 
         # Return the experiment data
         return self.export_experiment_data()
 
+    def add_sink(self, sink) -> None:
+        """Adds a sink which receives every completed point while scanning
+
+        A sink has a start(headers) method which is called when a scan starts, a write(rows) method which gets a
+        structured array with the new rows and a finish(order=None) method which is called when the scan ends or
+        fails. The rows are given in the order they are measured, when that is not the order of the returned data
+        finish() gets the indices of the rows in the sorted order.
+
+        Args:
+            sink (object): the sink to add, e.g. a CSVSink
+        """
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink) -> None:
+        """Removes a sink so it does not receive the points of the next scans
+
+        Args:
+            sink (object): the sink to remove
+        """
+        self.sinks.remove(sink)
+
+    def add_observer(
+        self, on_point=None, on_batch=None, on_finished=None, max_rate=20.0
+    ) -> ScanObserver:
+        """Adds callbacks which are called from the scanning thread on the events of the next scans
+
+        Args:
+            on_point (callable, optional): called with the index and the row of every new point. Defaults to None.
+            on_batch (callable, optional): called with a structured array of the new points, at most max_rate times per second. Defaults to None.
+            on_finished (callable, optional): called when a scan has ended, with the exception if it failed or None. Defaults to None.
+            max_rate (float, optional): maximum number of batches per second. Defaults to 20.0.
+
+        Returns:
+            ScanObserver: the observer, to give to remove_observer()
+        """
+        observer = ScanObserver(on_point, on_batch, on_finished, max_rate)
+        self.observers.append(observer)
+        return observer
+
+    def remove_observer(self, observer) -> None:
+        """Removes an observer so it is not called back on the next scans
+
+        Args:
+            observer (ScanObserver): the observer returned by add_observer()
+        """
+        self.observers.remove(observer)
+
+    def _start_sinks(self) -> None:
+        """This function tells the sinks and observers that a scan starts"""
+        self._pushed_size = 0
+        for sink in self.sinks:
+            sink.start(HEADERS)
+        for observer in self.observers:
+            observer.start()
+
+    def _push_rows(self) -> None:
+        """This function gives the rows that are completed since the last push to the sinks and observers"""
+        if not self.sinks and not self.observers:
+            return
+        rows = self.snapshot()[self._pushed_size :]
+        self._pushed_size += len(rows)
+        for sink in self.sinks:
+            sink.write(rows)
+        for observer in self.observers:
+            observer.write(rows)
+
+    def _finish_sinks(self, order=None) -> None:
+        """This function gives the last rows to the sinks and observers and tells the sinks that the scan has ended
+
+        Args:
+            order (np.ndarray, optional): indices of the rows in the order of the returned data, if they are not measured in that order. Defaults to None.
+        """
+        self._push_rows()
+        for sink in self.sinks:
+            sink.finish(order)
+        for observer in self.observers:
+            observer.flush()
+
+    def _notify_finished(self, error=None) -> None:
+        """This function tells the observers that the scan has ended, after the scan has released the device
+
+        Args:
+            error (BaseException, optional): the exception which stopped the scan. Defaults to None.
+        """
+        for observer in self.observers:
+            observer.finished(error)
+
+    def _refined_output_values(
+        self, start_digital, stop_digital, max_points, coarse_step, currents
+    ):
+        """Generator of the output values of a coarse-to-fine scan
+
+        First a coarse pass is made, then the interval with the highest score is split in two until max_points
+        values are measured or no interval can be split anymore. The score of an interval is the change in slope
+        at its ends in normalized (output value, current) coordinates, times its length. So the knee, where the
+        curve bends, is refined, and not the straight parts of the curve however steep they are. A small part of
+        the score is the length alone, so the straight parts are refined evenly once the knee is resolved.
+
+        Args:
+            start_digital (int): digital value at which the scan starts
+            stop_digital (int): digital value at which the scan stops
+            max_points (int): maximum number of output values
+            coarse_step (int): step in digital values of the coarse pass
+            currents (dict): the scan stores the measured current of each output value in here before the next value is requested
+
+        Yields:
+            int: the next output value to measure
+        """
+        # The coarse pass must fit in the budget
+        value_span = stop_digital - start_digital
+        coarse_step = max(coarse_step, math.ceil(value_span / (max_points - 1)), 1)
+        coarse = list(range(start_digital, stop_digital + 1, coarse_step))
+        if coarse[-1] != stop_digital:
+            coarse.append(stop_digital)
+        for output_val in coarse:
+            yield output_val
+
+        # Normalize with the ranges found in the coarse pass
+        coarse_currents = [currents[output_val] for output_val in coarse]
+        current_range = max(coarse_currents) - min(coarse_currents) or 1.0
+        value_range = value_span or 1
+
+        # The measured output values in order, and the right end and score of every interval by its left end
+        points = list(coarse)
+        scores = {}
+        intervals = []
+
+        def slope(left, right):
+            return (
+                (currents[right] - currents[left])
+                / current_range
+                * value_range
+                / (right - left)
+            )
+
+        def bend(index):
+            if index == 0 or index == len(points) - 1:
+                return 0.0
+            previous, point, following = points[index - 1 : index + 2]
+            return abs(slope(point, following) - slope(previous, point))
+
+        def rescore(index):
+            # Intervals of neighbouring output values can not be split, old heap entries are skipped when popped
+            if 0 <= index < len(points) - 1:
+                left, right = points[index], points[index + 1]
+                if right - left > 1:
+                    length = (right - left) / value_range
+                    score = (bend(index) + bend(index + 1) + 0.1) * length
+                    scores[left] = (right, score)
+                    heapq.heappush(intervals, (-score, left, right))
+
+        for index in range(len(points) - 1):
+            rescore(index)
+
+        measured = len(coarse)
+        while intervals and measured < max_points:
+            score, left, right = heapq.heappop(intervals)
+            if scores.get(left) != (right, -score):
+                continue
+            del scores[left]
+            middle = (left + right) // 2
+            yield middle
+            measured += 1
+
+            # The new point changes the slopes at the ends of the neighbouring intervals too
+            index = bisect.bisect(points, middle)
+            points.insert(index, middle)
+            for neighbour in range(index - 2, index + 2):
+                rescore(neighbour)
+
+    def _sort_rows(self, order) -> None:
+        """This function puts the stored rows in the given order
+
+        Args:
+            order (np.ndarray): indices of the rows in their new order
+        """
+        # The sorted rows go to a new buffer, readers keep using the old one until it is published
+        data = np.zeros(len(self.data), dtype=DATA_DTYPE)
+        data[: self.size] = self.snapshot()[order]
+        if len(self.counts):
+            counts = np.zeros_like(self.counts)
+            counts[: self.size] = self.counts[: self.size][order]
+            self.counts = counts
+        self.data = data
+        self._publish()
+
+    def _measure_step(self, device, sample_size, target_error=None, min_samples=2):
+        """Function to take the samples of a single voltage level, the queries are pipelined
+
+        Without a target error sample_size samples are taken. With a target error sampling stops as soon as the
+        standard error of both channels is at most the target error, or when sample_size samples are taken.
+
+        Args:
+            device (ArduinoVISADevice): the device controlling the experiment
+            sample_size (int): (maximum) number of samples to take
+            target_error (float, optional): target standard error of both channels in volt. Defaults to None.
+            min_samples (int, optional): number of samples to take before checking the target error. Defaults to 2.
+
+        Returns:
+            tuple: RunningStatistics of the total voltage and of the resistor voltage
+        """
+        statistics = (RunningStatistics(), RunningStatistics())
+        n = sample_size if target_error is None else min(min_samples, sample_size)
+        while n > 0:
+            for channel_statistics, samples in zip(
+                statistics, device.measure_block(channels=[1, 2], n=n)
+            ):
+                channel_statistics.add(samples)
+            count = statistics[0].count
+
+            # A single sample has no error, so it can not have converged
+            if target_error is None or (
+                count > 1
+                and all(
+                    channel_statistics.standard_error <= target_error
+                    for channel_statistics in statistics
+                )
+            ):
+                break
+
+            # Estimate the number of samples needed from standard error = std / sqrt(n), and take them at once
+            needed = max(
+                math.ceil((channel_statistics.std / target_error) ** 2)
+                for channel_statistics in statistics
+            )
+            n = min(max(needed - count, 1), sample_size - count)
+        return statistics
+
     # Method to add measurement to instance
     def add_measurement(
         self, R, total_volt, resistor_volt, total_volt_error, resistor_volt_error
     ) -> None:
-        """Function to store measurements in the lists for experiment data
+        """Function to store measurements in the buffer for experiment data
+
+        The current and LED voltage are not calculated here, they are calculated for all new rows at once when the data is read.
 
         Args:
             R (int): resistance of the resistor in the experiment in ohm
@@ -145,68 +940,197 @@ class DiodeExperiment:
         # make sure the load is not set to zero to avoid zero division errors
         assert R != 0, "Loads of zero are not allowed"
 
-        # Append the values that do not need calculation
-        self.resistor_loads.append(R)
-        self.total_voltages.append(total_volt)
-        self.total_voltages_errors.append(total_volt_error)
-        self.resistor_voltages.append(resistor_volt)
-        self.resistor_voltages_errors.append(resistor_volt_error)
+        # Grow the buffer when it is full
+        if self.size == len(self.data):
+            self.reserve(max(2 * len(self.data), 16))
+
+        # Store the values that do not need calculation
+        row = self.data[self.size]
+        row["resistor_loads"] = R
+        row["total_voltages"] = total_volt
+        row["total_voltages_errors"] = total_volt_error
+        row["resistor_voltages"] = resistor_volt
+        row["resistor_voltages_errors"] = resistor_volt_error
+
+        # Only publish the row after it is written
+        self.size += 1
+        self._publish()
+
+    def add_counts(self, R, counts) -> None:
+        """Function to store the digital values of the samples of a single voltage step
+
+        The values are converted to voltages and statistics when the data is read.
+
+        Args:
+            R (int): resistance of the resistor in the experiment in ohm
+            counts (np.ndarray): uint16 array of shape (2, sample_size) with the digital values of channel 1 and 2
+        """
+        # make sure the load is not set to zero to avoid zero division errors
+        assert R != 0, "Loads of zero are not allowed"
+
+        # Allocate the buffer for the shape of the samples and grow it when it is full
+        if self.counts.shape[1:] != counts.shape:
+            assert self.size == 0, "All steps need the same number of samples"
+            self.counts = np.zeros((16,) + counts.shape, dtype=np.uint16)
+        elif self.size == len(self.counts):
+            counts_buffer = np.zeros(
+                (2 * len(self.counts),) + counts.shape, dtype=np.uint16
+            )
+            counts_buffer[: self.size] = self.counts[: self.size]
+            self.counts = counts_buffer
+        self.reserve(len(self.counts))
+
+        self.counts[self.size] = counts
+        self.data["resistor_loads"][self.size] = R
+
+        # Only publish the step after it is written
+        self.size += 1
+        self._publish()
+
+    def recalculate(self, resistor_load=None) -> None:
+        """This function calculates the experiment data again from the stored digital values, without measuring again
+
+        Args:
+            resistor_load (int, optional): resistance of the resistor in ohm to use instead of the one used during the experiment. Defaults to None.
+        """
+        # The rows are calculated in a new buffer, readers keep using the old one until it is published
+        data = self.data.copy()
+        if resistor_load is not None:
+            assert resistor_load != 0, "Loads of zero are not allowed"
+            data["resistor_loads"][: self.size] = resistor_load
+        self.data = data
+        self._publish()
+        self.snapshot()
+
+    def reserve(self, capacity) -> None:
+        """This function makes sure the buffer for experiment data can hold at least capacity rows
+
+        Args:
+            capacity (int): number of rows the buffer has to hold
+        """
+        if capacity > len(self.data):
+            data = np.zeros(capacity, dtype=DATA_DTYPE)
+            data[: self.size] = self.data[: self.size]
+            self.data = data
+            self._publish()
+
+    def _publish(self) -> None:
+        """This function makes the buffers and the number of stored rows visible to readers
+
+        The three are replaced at once, so a reader always gets a row count which fits the buffers it gets. Rows
+        are never changed after they are published, a buffer that is sorted or recalculated is a new buffer.
+        """
+        self._published = (self.data, self.counts, self.size)
+        self.generation += 1
+
+    def _prepare(self, data, counts, size) -> None:
+        """This function calculates the values of published rows which are not calculated yet
 
-        # Calculate the current with voltage/load and store the result
-        circuit_current = resistor_volt / R
-        current_error = resistor_volt_error / R
-        self.currents.append(circuit_current)
-        self.currents_errors.append(current_error)
+        It can run in any thread at the same time as the scan. Two threads calculating the same row write the same
+        values, so no lock is needed. The calculated rows are remembered with their buffer, a new buffer is
+        calculated from the start.
 
-        # Calculate LED voltage and load and power
-        led_volt = total_volt - resistor_volt
-        led_volt_error = np.sqrt((total_volt_error) ** 2 + (resistor_volt_error) ** 2)
+        Args:
+            data (np.ndarray): the published buffer for experiment data
+            counts (np.ndarray): the published buffer for the digital values of the samples, empty if not used
+            size (int): the published number of rows
+        """
+        ready_data, start = self._ready
+        if ready_data is not data:
+            start = 0
+        if start >= size:
+            return
+        rows = data[start:size]
+
+        # Convert the digital values with the lookup table, the result has shape (steps, channels, samples)
+        if len(counts):
+            voltages = VOLTAGE_LUT[counts[start:size]]
+            sample_size = voltages.shape[-1]
+
+            # Calculate the total volt and resister volt by taking the mean of the samples
+            means = voltages.mean(axis=-1)
+            rows["total_voltages"] = means[:, 0]
+            rows["resistor_voltages"] = means[:, 1]
 
-        # Store results
-        self.led_voltages.append(led_volt)
-        self.led_voltages_errors.append(led_volt_error)
+            # Note standard error = standard deviation / sqrt(sample_size), if sample_size is 1 no errors can be determined
+            errors = (
+                voltages.std(axis=-1) / np.sqrt(sample_size)
+                if sample_size > 1
+                else np.zeros_like(means)
+            )
+            rows["total_voltages_errors"] = errors[:, 0]
+            rows["resistor_voltages_errors"] = errors[:, 1]
+
+        # Calculate the current with voltage/load
+        rows["currents"] = rows["resistor_voltages"] / rows["resistor_loads"]
+        rows["currents_errors"] = (
+            rows["resistor_voltages_errors"] / rows["resistor_loads"]
+        )
+
+        # Calculate LED voltage and its error
+        rows["led_voltages"] = rows["total_voltages"] - rows["resistor_voltages"]
+        rows["led_voltages_errors"] = np.sqrt(
+            rows["total_voltages_errors"] ** 2 + rows["resistor_voltages_errors"] ** 2
+        )
+        self._ready = (data, size)
+
+    def snapshot(self) -> np.ndarray:
+        """Function to get a consistent view on the experiment data, it can be called from any thread while scanning
+
+        All columns of the view have the same length, and the view does not change when points are added or the
+        data is cleared. It does not copy the data and never waits for the scanning thread.
+
+        Returns:
+            np.ndarray: structured array view on the stored rows, the columns are accessible by their DATA_DTYPE field name
+        """
+        data, counts, size = self._published
+        self._prepare(data, counts, size)
+        return data[:size]
+
+    def column(self, name) -> np.ndarray:
+        """Function to get a column of the experiment data
+
+        Columns that are read one by one can have different lengths while scanning, use snapshot() to read
+        several columns.
+
+        Args:
+            name (string): name of the column, one of the field names of DATA_DTYPE
+
+        Returns:
+            np.ndarray: view on the filled part of the column, this is not a copy
+        """
+        return self.snapshot()[name]
 
     def export_experiment_data(self) -> tuple:
         """Function to export the stored experiment data
 
         Returns:
-            tuple: tuple object containing a list of headers and a zip object containing the lists with the experiment data
-        """
-
-        headers = [
-            "Total voltage (V)",
-            "Total V error",
-            "Resistor Voltage (V)",
-            "Resistor V error",
-            "LED voltage (V)",
-            "LED V error",
-            "Current (A)",
-            "Current error",
-            "Resistor load (Ohm)",
-        ]
-        data = zip(
-            self.total_voltages,
-            self.total_voltages_errors,
-            self.resistor_voltages,
-            self.resistor_voltages_errors,
-            self.led_voltages,
-            self.led_voltages_errors,
-            self.currents,
-            self.currents_errors,
-            self.resistor_loads,
-        )
-
-        return (headers, data)
+            tuple: tuple object containing a list of headers and a structured array view on the experiment data, the columns are accessible by their DATA_DTYPE field name and iterating gives the rows
+        """
+        return (HEADERS, self.snapshot())
 
     # Method to clear the stored data
     def clear(self) -> None:
-        """This function clears lists containing the experiment data"""
-        self.resistor_loads = []
-        self.total_voltages = []
-        self.total_voltages_errors = []
-        self.resistor_voltages = []
-        self.resistor_voltages_errors = []
-        self.led_voltages = []
-        self.led_voltages_errors = []
-        self.currents = []
-        self.currents_errors = []
+        """This function clears the buffer containing the experiment data"""
+        self.data = np.zeros(0, dtype=DATA_DTYPE)
+        self.size = 0
+
+        # Digital values of the samples, only used in raw mode
+        self.counts = np.zeros((0, 2, 0), dtype=np.uint16)
+
+        # Buffer and number of rows of which the current and LED voltage are calculated
+        self._ready = (self.data, 0)
+        self._publish()
+
+    # Columns of the experiment data
+    total_voltages = property(lambda self: self.column("total_voltages"))
+    total_voltages_errors = property(lambda self: self.column("total_voltages_errors"))
+    resistor_voltages = property(lambda self: self.column("resistor_voltages"))
+    resistor_voltages_errors = property(
+        lambda self: self.column("resistor_voltages_errors")
+    )
+    led_voltages = property(lambda self: self.column("led_voltages"))
+    led_voltages_errors = property(lambda self: self.column("led_voltages_errors"))
+    currents = property(lambda self: self.column("currents"))
+    currents_errors = property(lambda self: self.column("currents_errors"))
+    resistor_loads = property(lambda self: self.column("resistor_loads"))
@@ -0,0 +1,95 @@
+import json
+import os
+
+
+class ScanJournal:
+    """This class keeps an append-only journal of a scan, so an interrupted scan can be resumed
+
+    Every line of the journal is a JSON object. The first line holds the configuration of the scan, every next
+    line a completed step and the last line marks that the scan has finished.
+    """
+
+    def __init__(self, path, fsync=False) -> None:
+        """Creates an instance of the ScanJournal class, the file is opened by start() or reopen()
+
+        Args:
+            path (string): path of the journal file
+            fsync (bool, optional): make sure every step is on disk, so it even survives a power failure. Defaults to False.
+        """
+        self.path = path
+        self.fsync = fsync
+        self.file = None
+
+    def start(self, config) -> None:
+        """Starts a new journal, an existing journal is overwritten
+
+        Args:
+            config (dict): the options of the scan
+        """
+        self.file = open(self.path, "w")
+        self._append({"config": config})
+
+    def reopen(self) -> None:
+        """Opens an existing journal to add the steps of a resumed scan"""
+        # Remove a line that was cut off when the process died while writing it
+        with open(self.path, "rb+") as file:
+            file.truncate(file.read().rfind(b"\n") + 1)
+        self.file = open(self.path, "a")
+
+    def record(self, output_value, **step) -> None:
+        """Adds a completed step to the journal
+
+        Args:
+            output_value (int): the output value of the step
+            **step: the results of the step, like the measured values or the digital values of the samples
+        """
+        self._append({"output_value": output_value, **step})
+
+    def finish(self) -> None:
+        """Marks the scan as finished and closes the journal"""
+        self._append({"finished": True})
+        self.close()
+
+    def close(self) -> None:
+        """Closes the journal"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _append(self, entry) -> None:
+        """Writes a line to the journal and hands it to the operating system
+
+        Args:
+            entry (dict): the line to write
+        """
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    @staticmethod
+    def read(path) -> tuple:
+        """Reads a journal
+
+        Args:
+            path (string): path of the journal file
+
+        Returns:
+            tuple: the configuration of the scan, a list with the completed steps and whether the scan has finished
+        """
+        config, steps, finished = None, [], False
+        with open(path) as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line can be cut off when the process died while writing it
+                    break
+                if "config" in entry:
+                    config = entry["config"]
+                elif "finished" in entry:
+                    finished = True
+                else:
+                    steps.append(entry)
+        assert config is not None, f"{path} is not a scan journal"
+        return config, steps, finished
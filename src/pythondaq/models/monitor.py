@@ -0,0 +1,176 @@
+import numpy as np
+from pythondaq.controllers.arduino_device import VOLTAGE_LUT
+
+# Number of samples a monitor file holds by default, the oldest samples are overwritten when it is full
+MONITOR_CAPACITY = 1_000_000
+
+# Identifies a monitor file and the version of its layout
+MAGIC = b"PDAQMON1"
+
+# Header at the start of the file, count is the number of samples written so far and reserved the number of
+# samples written once the block that is being written is complete
+HEADER_DTYPE = np.dtype(
+    {
+        "names": [
+            "magic",
+            "capacity",
+            "count",
+            "reserved",
+            "started",
+            "resistor_load",
+            "output_value",
+        ],
+        "formats": ["S8", "<u8", "<u8", "<u8", "<f8", "<f8", "<u2"],
+        "offsets": [0, 8, 16, 24, 32, 40, 48],
+        "itemsize": 64,
+    }
+)
+
+# A sample, with the time in seconds since the epoch and the digital values of both channels
+SAMPLE_DTYPE = np.dtype(
+    [("time", "<f8"), ("total_counts", "<u2"), ("resistor_counts", "<u2")]
+)
+
+
+class MonitorBuffer:
+    """This class stores the samples of a monitoring run in a ring buffer file of fixed size
+
+    The file is memory-mapped, so memory use stays the same however long the run is and other processes can open
+    the file to read the latest samples while it is written. A block of samples is written after the reserved
+    count is raised and before the count is raised, so a reader knows which samples it may have seen overwritten.
+    """
+
+    def __init__(
+        self, file_path, capacity=None, output_value=0, resistor_load=220, started=0.0
+    ) -> None:
+        """Creates an instance of the MonitorBuffer class, with a new file if a capacity is given
+
+        Args:
+            file_path (string): path of the monitor file
+            capacity (int, optional): number of samples of a new file, an existing file is opened read-only if None. Defaults to None.
+            output_value (int, optional): digital value the output is held at, stored in a new file. Defaults to 0.
+            resistor_load (int, optional): resistance of the resistor in ohm, stored in a new file. Defaults to 220.
+            started (float, optional): time the run started in seconds since the epoch, stored in a new file. Defaults to 0.0.
+        """
+        self.file_path = file_path
+        if capacity is None:
+            self.header = np.memmap(file_path, HEADER_DTYPE, mode="r", shape=(1,))
+            assert (
+                self.header["magic"][0] == MAGIC
+            ), f"{file_path} is not a monitor file"
+            mode = "r"
+        else:
+            assert capacity > 0, "A monitor file needs room for at least one sample"
+            self.header = np.memmap(file_path, HEADER_DTYPE, mode="w+", shape=(1,))
+            self.header["capacity"] = capacity
+            self.header["started"] = started
+            self.header["resistor_load"] = resistor_load
+            self.header["output_value"] = output_value
+            mode = "r+"
+
+        self.capacity = int(self.header["capacity"][0])
+        self.samples = np.memmap(
+            file_path,
+            SAMPLE_DTYPE,
+            mode=mode,
+            offset=HEADER_DTYPE.itemsize,
+            shape=(self.capacity,),
+        )
+
+        # The magic is written last, so a reader never opens a file which is not set up yet
+        if capacity is not None:
+            self.header["magic"] = MAGIC
+            self.header.flush()
+
+    @property
+    def count(self) -> int:
+        """Number of samples written so far, including the overwritten ones"""
+        return int(self.header["count"][0])
+
+    @property
+    def started(self) -> float:
+        """Time the run started in seconds since the epoch"""
+        return float(self.header["started"][0])
+
+    @property
+    def resistor_load(self) -> float:
+        """Resistance of the resistor in ohm"""
+        return float(self.header["resistor_load"][0])
+
+    @property
+    def output_value(self) -> int:
+        """Digital value the output is held at"""
+        return int(self.header["output_value"][0])
+
+    def append(self, times, counts) -> None:
+        """Adds a block of samples, the oldest samples are overwritten when the file is full
+
+        Args:
+            times (np.ndarray): time of every sample in seconds since the epoch
+            counts (np.ndarray): digital values of shape (2, n), the first row of the total voltage and the second of the resistor voltage
+        """
+        n = len(times)
+        assert n <= self.capacity, "The block is larger than the monitor file"
+        count = self.count
+        self.header["reserved"] = count + n
+
+        # The block wraps around the end of the file in at most two parts
+        index = count % self.capacity
+        first = min(n, self.capacity - index)
+        for source, target in (
+            (slice(0, first), slice(index, index + first)),
+            (slice(first, n), slice(0, n - first)),
+        ):
+            block = self.samples[target]
+            block["time"] = times[source]
+            block["total_counts"] = counts[0, source]
+            block["resistor_counts"] = counts[1, source]
+        self.header["count"] = count + n
+
+    def tail(self, n=None) -> np.ndarray:
+        """Gives a copy of the latest samples, it can be called while another process writes the file
+
+        Args:
+            n (int, optional): maximum number of samples, all samples in the file if None. Defaults to None.
+
+        Returns:
+            np.ndarray: structured array with the time and the digital values of the samples, oldest first
+        """
+        count = self.count
+        n = min(count, self.capacity if n is None else min(n, self.capacity))
+        first = count - n
+        rows = np.array(self.samples[np.arange(first, count) % self.capacity])
+
+        # Samples that were overwritten while copying are dropped
+        overwritten = int(self.header["reserved"][0]) - self.capacity - first
+        return rows[max(0, overwritten) :]
+
+    def columns(self, rows) -> dict:
+        """Converts samples to voltages and currents
+
+        Args:
+            rows (np.ndarray): samples from tail()
+
+        Returns:
+            dict: the times and the total, resistor and LED voltages and the currents of the samples
+        """
+        total_voltages = VOLTAGE_LUT[rows["total_counts"]]
+        resistor_voltages = VOLTAGE_LUT[rows["resistor_counts"]]
+        return {
+            "times": rows["time"],
+            "total_voltages": total_voltages,
+            "resistor_voltages": resistor_voltages,
+            "led_voltages": total_voltages - resistor_voltages,
+            "currents": resistor_voltages / self.resistor_load,
+        }
+
+    def flush(self) -> None:
+        """Writes the changed pages of the file to disk"""
+        self.samples.flush()
+        self.header.flush()
+
+    def close(self) -> None:
+        """Writes the file to disk and lets go of the memory maps, the buffer can not be used afterwards"""
+        if self.header.mode != "r":
+            self.flush()
+        del self.samples, self.header
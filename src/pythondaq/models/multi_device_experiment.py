@@ -0,0 +1,70 @@
+from pythondaq.models.diode_experiment import DiodeExperiment
+from rich.progress import Progress
+import threading
+
+
+class MultiDeviceExperiment:
+    """This class allows users to run the diode experiment on multiple devices at the same time"""
+
+    def __init__(self, ports, simulation=None) -> None:
+        """Creates an instance of the MultiDeviceExperiment class with a DiodeExperiment for every port
+
+        Args:
+            ports (list): ports of the devices controlling the experiments
+            simulation (dict, optional): settings for the simulated device (latency, noise, ...), used when scanning the simulated port. Defaults to None.
+        """
+        # Every device gets its own experiment, so the results are stored separately
+        self.experiments = {
+            port: DiodeExperiment(simulation=simulation) for port in ports
+        }
+
+        # Errors of the scans that failed, by port
+        self.errors = {}
+
+    def scan(self, **scan_options) -> dict:
+        """Function to run an independent scan on every device at the same time
+
+        Args:
+            **scan_options: options passed on to DiodeExperiment.scan() of every device, like start, stop and sample_size
+
+        Returns:
+            dict: the exported experiment data (headers and data) of every device that finished its scan, by port
+        """
+        self.errors = {}
+
+        # All scans share one progress display, with a bar for every device
+        with Progress() as progress:
+            threads = [
+                threading.Thread(
+                    target=self._scan_device,
+                    args=(port, progress, scan_options),
+                )
+                for port in self.experiments
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        return {
+            port: experiment.export_experiment_data()
+            for port, experiment in self.experiments.items()
+            if port not in self.errors
+        }
+
+    def _scan_device(self, port, progress, scan_options) -> None:
+        """Function that runs the scan of a single device, it is the target of the scan threads
+
+        Args:
+            port (string): port of the device
+            progress (rich.progress.Progress): shared progress display
+            scan_options (dict): options passed on to DiodeExperiment.scan()
+        """
+        experiment = self.experiments[port]
+        try:
+            experiment.scan(port=port, progress=progress, **scan_options)
+
+        # A failing device should not stop the scans on the other devices
+        except Exception as err:
+            self.errors[port] = err
+            experiment.is_scanning.clear()
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+
+
+class ScanObserver:
+    """This class calls back on the events of a scan, from the thread that runs the scan
+
+    Every point is reported as soon as it is measured. The points are also collected in batches which are
+    reported at most max_rate times per second, so a slow receiver like a GUI is not flooded when points are
+    measured quickly. The last batch is reported when the scan ends.
+    """
+
+    def __init__(
+        self, on_point=None, on_batch=None, on_finished=None, max_rate=20.0
+    ) -> None:
+        """Creates an instance of the ScanObserver class
+
+        Args:
+            on_point (callable, optional): called with the index and the row of every new point. Defaults to None.
+            on_batch (callable, optional): called with a structured array of the points since the last batch. Defaults to None.
+            on_finished (callable, optional): called when the scan has ended, with the exception if it failed or None. Defaults to None.
+            max_rate (float, optional): maximum number of batches per second. Defaults to 20.0.
+        """
+        assert max_rate > 0, "The maximum rate has to be positive"
+        self.on_point = on_point
+        self.on_batch = on_batch
+        self.on_finished = on_finished
+        self.interval = 1 / max_rate
+        self._pending = []
+        self._index = 0
+        self._last_batch = -np.inf
+
+    def start(self) -> None:
+        """Resets the observer for a new scan, the first batch is reported right away"""
+        self._pending = []
+        self._index = 0
+        self._last_batch = -np.inf
+
+    def write(self, rows) -> None:
+        """Reports the new points, and the batch when the last batch is long enough ago
+
+        Args:
+            rows (np.ndarray): structured array with the new rows
+        """
+        if self.on_point is not None:
+            for row in rows:
+                self.on_point(self._index, row)
+                self._index += 1
+        else:
+            self._index += len(rows)
+
+        if self.on_batch is not None and len(rows):
+            self._pending.append(rows)
+            if time.monotonic() - self._last_batch >= self.interval:
+                self.flush()
+
+    def flush(self) -> None:
+        """Reports the points that are not reported in a batch yet"""
+        if not self._pending:
+            return
+        rows = np.concatenate(self._pending)
+        self._pending = []
+        self._last_batch = time.monotonic()
+        self.on_batch(rows)
+
+    def finished(self, error=None) -> None:
+        """Reports that the scan has ended
+
+        Args:
+            error (BaseException, optional): the exception which stopped the scan. Defaults to None.
+        """
+        if self.on_finished is not None:
+            self.on_finished(error)
@@ -0,0 +1,43 @@
+import numpy as np
+
+
+class RunningStatistics:
+    """This class keeps the mean and standard deviation of a growing set of samples without storing the samples"""
+
+    def __init__(self) -> None:
+        """Creates an instance of the RunningStatistics class without any samples"""
+        self.count = 0
+        self.mean = 0.0
+
+        # Sum of the squared differences from the mean
+        self._m2 = 0.0
+
+    def add(self, values) -> None:
+        """Adds a batch of samples to the statistics
+
+        Args:
+            values (list): the samples to add
+        """
+        values = np.asarray(values, dtype=np.float64)
+        count = len(values)
+        if count == 0:
+            return
+
+        # Merge the statistics of the batch with the running statistics
+        mean = values.mean()
+        m2 = np.sum((values - mean) ** 2)
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+
+    @property
+    def std(self) -> float:
+        """Standard deviation of the samples, the same as np.std() of all samples"""
+        return np.sqrt(self._m2 / self.count) if self.count > 0 else 0.0
+
+    @property
+    def standard_error(self) -> float:
+        """Standard error of the mean, if there is only one sample no error can be determined"""
+        return self.std / np.sqrt(self.count) if self.count > 1 else 0.0
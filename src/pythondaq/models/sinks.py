@@ -0,0 +1,89 @@
+import csv
+import os
+
+
+class CSVSink:
+    """This class writes the points of a scan to a CSV file while the scan is running
+
+    Rows are collected in a buffer and written in batches, so the file grows during the scan while only a batch
+    of rows is kept in memory. When a scan fails the rows that are measured are still written. The rows of a scan
+    that measures out of order are sorted when it has finished, until then the file is in measurement order.
+    """
+
+    def __init__(self, path, batch_size=64, fsync=False) -> None:
+        """Creates an instance of the CSVSink class, the file is opened when the scan starts
+
+        Args:
+            path (string): path of the CSV file, an existing file is overwritten
+            batch_size (int, optional): number of rows that are written at once. Defaults to 64.
+            fsync (bool, optional): make sure every batch is on disk, so it even survives a power failure. Defaults to False.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.file = None
+        self._rows = []
+
+    def start(self, headers) -> None:
+        """Opens the file and writes the header
+
+        Args:
+            headers (list): the column names
+        """
+        self.file = open(self.path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+        self._flush()
+
+    def write(self, rows) -> None:
+        """Adds rows to the buffer and writes the buffer when it is full
+
+        Args:
+            rows (np.ndarray): structured array with the new rows
+        """
+        self._rows.extend(rows.tolist())
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+
+    def finish(self, order=None) -> None:
+        """Writes the remaining rows and closes the file
+
+        Args:
+            order (np.ndarray, optional): indices of the rows in the order in which the file is rewritten. Defaults to None.
+        """
+        if self.file is None:
+            return
+        self._flush()
+        self.file.close()
+        self.file = None
+        if order is not None:
+            self._rewrite(order)
+
+    def _flush(self) -> None:
+        """Writes the buffered rows and hands them to the operating system"""
+        self.writer.writerows(self._rows)
+        self._rows = []
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def _rewrite(self, order) -> None:
+        """Writes the rows of the file in another order, the file is replaced at once so it is never incomplete
+
+        Args:
+            order (np.ndarray): indices of the rows in their new order
+        """
+        with open(self.path, newline="") as file:
+            reader = csv.reader(file)
+            headers = next(reader)
+            rows = list(reader)
+
+        partial_path = f"{self.path}.partial"
+        with open(partial_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(headers)
+            writer.writerows(rows[index] for index in order)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(partial_path, self.path)
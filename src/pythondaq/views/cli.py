@@ -1,9 +1,11 @@
-from pythondaq.models.diode_experiment import DiodeExperiment
 import csv
+import re
 from os import listdir, path, mkdir, getcwd
-import matplotlib.pyplot as plt
 import click
 
+# The models, NumPy, rich and matplotlib are imported in the commands that use them, so commands like list and
+# runs start quickly
+
 
 @click.group()
 def cmd_group():
@@ -18,31 +20,56 @@ def cmd_group():
     help="only return devices which match with given search value",
     show_default=True,
 )
-def click_list(search=None):
+@click.option(
+    "--simulated",
+    is_flag=True,
+    help="also list the simulated device",
+)
+def click_list(search=None, simulated=False):
     """Function that prints a list of the connected devices
 
     Args:
         search (string, optional): search term to match connected devices to. Defaults to None.
+        simulated (bool, optional): flag variable to also list the simulated device. Defaults to False.
     """
-    list_devices(search, display=True)
+    list_devices(search, display=True, include_simulated=simulated)
 
 
-def list_devices(search=None, display=False):
+def list_devices(search=None, display=False, include_simulated=False):
     """Function that prints a list of the connected devices
 
+    The simulated device is only matched when it is named, as SIM or by its full port, or when it is included.
+
     Args:
         search (string, optional): search term to match connected devices to. Defaults to None.
         display (bool, optional): flag to toggle printing the device list. Defaults to False.
+        include_simulated (bool, optional): flag to also match the simulated device. Defaults to False.
 
     Returns:
         list: list containing the ports of connected devices
     """
+    from pythondaq.controllers.simulated_arduino import SIMULATED_PORT
+    from pythondaq.models.diode_experiment import DiodeExperiment
+
+    # A search for the simulated device by name does not match the real devices
+    if search and search.upper() in ("SIM", SIMULATED_PORT):
+        if display:
+            print([SIMULATED_PORT])
+            return
+        return [SIMULATED_PORT]
+
     if not search:
-        print(DiodeExperiment().get_connected_devices())
-        return DiodeExperiment().get_connected_devices()
+        devices = DiodeExperiment().get_connected_devices(
+            include_simulated=include_simulated
+        )
+        if display:
+            print(devices)
+        return devices
     else:
         matching = []
-        for device in DiodeExperiment().get_connected_devices():
+        for device in DiodeExperiment().get_connected_devices(
+            include_simulated=include_simulated
+        ):
             if search in device:
                 matching.append(device)
         # This makes sure that nothing is printed when the function is called in info() or scan()
@@ -66,6 +93,8 @@ def info(port):
     Args:
         port (string): port of a connected device. Partial ports are attempted to be matched.
     """
+    from pythondaq.models.diode_experiment import DiodeExperiment
+
     if not port:
         print("No device port was given")
 
@@ -76,7 +105,360 @@ def info(port):
         ), f"More than one device matches the given port value: {ports}"
         assert len(ports) > 0, "No devices match the given port value"
         port = ports.pop()
-        DiodeExperiment().device_info(port=port)
+        identification = DiodeExperiment().device_info(port=port)
+        if identification:
+            print(identification)
+
+
+@cmd_group.command()
+@click.option(
+    "-t",
+    "--timeout",
+    default=2.0,
+    type=click.FloatRange(0, min_open=True),
+    help="time in seconds to wait for each device to respond",
+    show_default=True,
+)
+def discover(timeout):
+    """Function that requests the identification string from all devices at the same time
+
+    The results are stored, so scan can pick the responding device when a port value matches multiple devices.
+
+    Args:
+        timeout (float): time in seconds to wait for each device to respond. Defaults to 2.0.
+    """
+    from pythondaq.models.diode_experiment import DiodeExperiment
+
+    for port, identification in DiodeExperiment().discover_devices(timeout).items():
+        print(f"{port}: {identification or 'no response'}")
+
+
+@cmd_group.command()
+@click.option(
+    "-p",
+    "--port",
+    default=None,
+    help="only list runs on devices which match with given port value",
+    show_default=True,
+)
+@click.option(
+    "-n",
+    "--min-number",
+    default=None,
+    type=click.IntRange(1),
+    help="only list runs with at least this sample size",
+    show_default=True,
+)
+@click.option(
+    "-s",
+    "--store",
+    default="DataStore",
+    type=click.Path(exists=True, file_okay=False),
+    help="directory of the data store",
+    show_default=True,
+)
+def runs(port, min_number, store):
+    """Function that lists the experiments in the data store, using its catalog
+
+    Args:
+        port (string): only list runs on devices which match with this value. Defaults to None.
+        min_number (int): only list runs with at least this sample size. Defaults to None.
+        store (string): directory of the data store. Defaults to "DataStore".
+    """
+    from pythondaq.models.catalog import ExperimentCatalog
+
+    catalog = ExperimentCatalog(store)
+    for run in catalog.find(port=port, min_sample_size=min_number):
+        print(
+            f"{run['id']:>5} {run['created'][:19]} {run['port'] or '-':<16} "
+            f"n={run['sample_size'] or '-':<4} {run['points'] or 0:>5} points  {run['status']:<8} {run['path']}"
+        )
+    catalog.close()
+
+
+@cmd_group.command()
+@click.option(
+    "--force/--no-force",
+    help="also convert files which are already converted",
+)
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+def convert(paths, force):
+    """Function that converts CSV files to directories with a binary NPY file for every column
+
+    Args:
+        paths (tuple): CSV files or data store directories to convert. Defaults to the DataStore directory.
+        force (bool): flag variable to also convert files which are already converted. Defaults to False.
+    """
+    from pythondaq.models.columnar import convert_csv, convert_directory
+
+    for data_path in paths or ("DataStore",):
+        if path.isdir(data_path):
+            directories = convert_directory(data_path, force=force)
+        else:
+            directories = [convert_csv(data_path, force=force)]
+        for directory in directories:
+            print(directory)
+
+
+def run_paths(paths) -> list:
+    """Function that lists the runs in the given paths
+
+    Args:
+        paths (tuple): CSV files, column directories or data store directories. Defaults to the DataStore directory.
+
+    Returns:
+        list: paths of the CSV files and column directories
+    """
+    from pythondaq.models.analysis import find_runs
+    from pythondaq.models.columnar import INDEX_FILE
+
+    data_paths = []
+    for data_path in paths or ("DataStore",):
+        # A data store directory is searched for runs, a column directory is a run itself
+        if path.isdir(data_path) and not path.isfile(path.join(data_path, INDEX_FILE)):
+            data_paths.extend(find_runs(data_path))
+        else:
+            data_paths.append(data_path)
+    return data_paths
+
+
+@cmd_group.command()
+@click.option(
+    "-o",
+    "--output",
+    default=None,
+    help="File path where the summary table should be saved as CSV if specified",
+    show_default=True,
+)
+@click.option(
+    "-w",
+    "--workers",
+    default=None,
+    type=click.IntRange(1),
+    help="number of processes that fit at the same time, the number of CPUs if not given",
+    show_default=True,
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    help="flag option to reuse the fits of runs that did not change",
+    show_default=True,
+)
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+def analyze(paths, output, workers, cache):
+    """Function that fits the Shockley diode equation to the U,I-curves of many runs and prints a summary table
+
+    Fits with physically impossible parameters or a large reduced chi squared are flagged in the quality column.
+
+    Args:
+        paths (tuple): CSV files, column directories or data store directories to analyze. Defaults to the DataStore directory.
+        output (string): path at which the summary table should be stored. Defaults to None.
+        workers (int): number of processes that fit at the same time. Defaults to None.
+        cache (bool): flag variable to reuse the fits of runs that did not change. Defaults to True.
+    """
+    from pythondaq.models.analysis import RESULT_COLUMNS, analyze as analyze_runs
+    from rich.console import Console
+    from rich.table import Table
+
+    data_paths = run_paths(paths)
+    kwargs = {} if cache else {"cache_path": None}
+    results = analyze_runs(data_paths, workers=workers, **kwargs)
+
+    table = Table("Run", "I_s (A)", "n", "R_s (Ohm)", "chi2/ndof", "points", "quality")
+    for result in results:
+        if "error" in result:
+            table.add_row(result["path"], result["error"])
+            continue
+        table.add_row(
+            result["path"],
+            f"{result['saturation_current']:.2e} ± {result['saturation_current_error']:.1e}",
+            f"{result['ideality_factor']:.3f} ± {result['ideality_factor_error']:.3f}",
+            f"{result['series_resistance']:.2f} ± {result['series_resistance_error']:.2f}",
+            f"{result['reduced_chi_squared']:.2f}",
+            str(result["points"]),
+            result["quality"],
+        )
+    Console().print(table)
+
+    if output:
+        with open(output, "w", newline="") as file:
+            writer = csv.DictWriter(
+                file, ["path", *RESULT_COLUMNS, "error"], extrasaction="ignore"
+            )
+            writer.writeheader()
+            writer.writerows(results)
+
+
+@cmd_group.command()
+@click.option(
+    "-o",
+    "--output",
+    default="ImageStore",
+    help="directory where the images are saved",
+    show_default=True,
+)
+@click.option(
+    "-f",
+    "--format",
+    "image_formats",
+    multiple=True,
+    default=["jpg"],
+    type=click.Choice(["jpg", "png", "pdf", "svg"]),
+    help="format of the images, can be given more than once",
+    show_default=True,
+)
+@click.option(
+    "-d",
+    "--dpi",
+    "dpis",
+    multiple=True,
+    default=[100],
+    type=click.IntRange(1),
+    help="resolution of the images in dots per inch, can be given more than once",
+    show_default=True,
+)
+@click.option(
+    "-w",
+    "--workers",
+    default=None,
+    type=click.IntRange(1),
+    help="number of processes that render at the same time, the number of CPUs if not given",
+    show_default=True,
+)
+@click.option(
+    "--force/--no-force",
+    help="also render images which are newer than their data",
+)
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+def render(paths, output, image_formats, dpis, workers, force):
+    """Function that renders the plots of many runs to image files without showing them
+
+    Args:
+        paths (tuple): CSV files, column directories or data store directories to render. Defaults to the DataStore directory.
+        output (string): directory where the images are saved. Defaults to "ImageStore".
+        image_formats (tuple): formats of the images. Defaults to ("jpg",).
+        dpis (tuple): resolutions of the images in dots per inch. Defaults to (100,).
+        workers (int): number of processes that render at the same time. Defaults to None.
+        force (bool): flag variable to also render images which are up-to-date. Defaults to False.
+    """
+    from pythondaq.views.render import render as render_runs
+
+    results = render_runs(
+        run_paths(paths),
+        output,
+        formats=tuple(dict.fromkeys(image_formats)),
+        dpis=tuple(dict.fromkeys(dpis)),
+        workers=workers,
+        force=force,
+    )
+    for result in results:
+        if "error" in result:
+            print(f"{result['path']}: {result['error']}")
+        for image_path in result["images"]:
+            print(image_path)
+    rendered = sum(len(result["images"]) for result in results)
+    skipped = sum(len(result["skipped"]) for result in results)
+    failed = sum("error" in result for result in results)
+    print(
+        f"Rendered {rendered} images, skipped {skipped} up-to-date images, {failed} runs failed"
+    )
+
+
+@cmd_group.command()
+@click.option(
+    "-f",
+    "--file",
+    "metrics_file",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSON file of the metrics, the metrics of the last scan with --metrics if not given",
+    show_default=True,
+)
+@click.option(
+    "--prometheus",
+    is_flag=True,
+    help="print the metrics in the Prometheus text format",
+)
+def stats(metrics_file, prometheus):
+    """Function that shows the command latencies, step timing, errors and timeouts recorded by scan --metrics
+
+    Args:
+        metrics_file (string): path of the JSON file of the metrics. Defaults to None.
+        prometheus (bool): flag variable to print the metrics in the Prometheus text format. Defaults to False.
+    """
+    from pythondaq.controllers.instrumentation import (
+        METRICS_PATH,
+        load_metrics,
+        prometheus_text,
+    )
+
+    metrics_file = metrics_file or METRICS_PATH
+    assert path.isfile(
+        metrics_file
+    ), f"No metrics found at {metrics_file}, run a scan with --metrics first"
+    created, scans = load_metrics(metrics_file)
+    if prometheus:
+        print(prometheus_text(scans), end="")
+        return
+
+    from rich.console import Console
+    from rich.table import Table
+
+    console = Console()
+    console.print(f"Metrics of {created[:19]}")
+    for metrics in scans:
+        table = Table(
+            "Timer", "count", "mean (ms)", "p50 (ms)", "p99 (ms)", "errors", "timeouts"
+        )
+        timers = [
+            (command, metrics.commands[command]) for command in sorted(metrics.commands)
+        ]
+        timers += [
+            (f"step {phase}", histogram) for phase, histogram in metrics.phases.items()
+        ]
+        for name, histogram in timers:
+            table.add_row(
+                name,
+                str(histogram.count),
+                (
+                    f"{histogram.sum / histogram.count * 1e3:.3f}"
+                    if histogram.count
+                    else "-"
+                ),
+                f"<= {histogram.quantile(0.5) * 1e3:g}" if histogram.count else "-",
+                f"<= {histogram.quantile(0.99) * 1e3:g}" if histogram.count else "-",
+                str(metrics.errors.get(name, 0)),
+                str(metrics.timeouts.get(name, 0)),
+            )
+
+        # Failed commands which never got a reply have no latency
+        for name in sorted(set(metrics.errors) | set(metrics.timeouts)):
+            if name not in metrics.commands:
+                table.add_row(
+                    name,
+                    "0",
+                    "-",
+                    "-",
+                    "-",
+                    str(metrics.errors.get(name, 0)),
+                    str(metrics.timeouts.get(name, 0)),
+                )
+        table.title = f"{metrics.port}, {metrics.steps} steps"
+        console.print(table)
+
+
+def device_output_path(output, port):
+    """Function that adds the port of a device to an output file path
+
+    Args:
+        output (string): file path where output should be saved
+        port (string): port of the device
+
+    Returns:
+        string: file path with the port added before the extension, e.g. data_ASRL5_INSTR.csv
+    """
+    root, extension = path.splitext(output)
+    return f"{root}_{re.sub(r'[^A-Za-z0-9]+', '_', port).strip('_')}{extension}"
 
 
 @cmd_group.command()
@@ -103,6 +485,15 @@ def info(port):
     help="File path where ouput should be saved if specified",
     show_default=True,
 )
+@click.option(
+    "-f",
+    "--format",
+    "output_format",
+    default="csv",
+    type=click.Choice(["csv", "npy"]),
+    help="format of the output, npy stores a directory with a binary file for every column",
+    show_default=True,
+)
 @click.option(
     "-g",
     "--graph/--no-graph",
@@ -115,8 +506,123 @@ def info(port):
     help="sample size of measurments per voltage",
     show_default=True,
 )
-@click.argument("port", type=str)
-def scan(port, begin, end, output, graph, number):
+@click.option(
+    "--latency",
+    default=0.0,
+    type=click.FloatRange(0),
+    help="round-trip time per query in seconds, only used for the simulated device",
+    show_default=True,
+)
+@click.option(
+    "--noise",
+    default=1.0,
+    type=click.FloatRange(0),
+    help="measurement noise in ADC counts, only used for the simulated device",
+    show_default=True,
+)
+@click.option(
+    "-d",
+    "--deferred/--no-deferred",
+    help="flag option to send output values without waiting for their acknowledgement",
+)
+@click.option(
+    "-r",
+    "--raw/--no-raw",
+    help="flag option to store the digital values of the samples and convert them after the scan",
+)
+@click.option(
+    "-t",
+    "--target-error",
+    default=None,
+    type=click.FloatRange(0, min_open=True),
+    help="sample each voltage until the standard error is at most this value, the sample size is then the maximum",
+    show_default=True,
+)
+@click.option(
+    "--min-samples",
+    default=2,
+    type=click.IntRange(1),
+    help="number of samples per voltage before checking the target error",
+    show_default=True,
+)
+@click.option(
+    "-m",
+    "--max-points",
+    default=None,
+    type=click.IntRange(2),
+    help="measure at most this many voltages, starting coarse and refining where the curve changes most",
+    show_default=True,
+)
+@click.option(
+    "--coarse-step",
+    default=32,
+    type=click.IntRange(1),
+    help="step in digital values of the coarse pass when --max-points is given",
+    show_default=True,
+)
+@click.option(
+    "-a",
+    "--all",
+    "scan_all",
+    is_flag=True,
+    help="scan all devices matching the port value at the same time, or all connected devices if no port is given",
+)
+@click.option(
+    "-j",
+    "--journal",
+    default=None,
+    help="File path of a journal in which every completed voltage is recorded, so the scan can be resumed",
+    show_default=True,
+)
+@click.option(
+    "--resume",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="continue the interrupted scan of this journal with its settings, the port is only needed if the device moved",
+    show_default=True,
+)
+@click.option(
+    "-M",
+    "--metrics",
+    is_flag=True,
+    help="record the latency of every device command and the timing of every step, shown by the stats command",
+)
+@click.option(
+    "--profile",
+    default=None,
+    help="File path where a timeline of the scan is saved as Chrome trace-event JSON, for chrome://tracing or Perfetto",
+    show_default=True,
+)
+@click.option(
+    "--profile-stats",
+    default=None,
+    help="File path where the cProfile stats of the scan are saved, for pstats or snakeviz",
+    show_default=True,
+)
+@click.argument("port", type=str, required=False)
+def scan(
+    port,
+    begin,
+    end,
+    output,
+    output_format,
+    graph,
+    number,
+    latency,
+    noise,
+    deferred,
+    raw,
+    target_error,
+    min_samples,
+    max_points,
+    coarse_step,
+    scan_all,
+    journal,
+    resume,
+    metrics,
+    profile,
+    profile_stats,
+):
     """Function that starts an experiment
 
     Args:
@@ -124,137 +630,327 @@ def scan(port, begin, end, output, graph, number):
         begin (float): analog voltage at which the experiment starts. Defaults to 0.0.
         end (float): analog voltage at which the experiment stops. Defaults to 3.3.
         output (string): path at which data should be stored. Defaults to None.
+        output_format (string): format of the output, "csv" or "npy". Defaults to "csv".
         graph (bool): flag variable to determine whether output needs to be plotted. Defaults to False.
         number (int): number of samples to take at each voltage level. Defaults to 5.
+        latency (float): round-trip time per query of the simulated device in seconds. Defaults to 0.0.
+        noise (float): measurement noise of the simulated device in ADC counts. Defaults to 1.0.
+        deferred (bool): flag variable to send output values without waiting for their acknowledgement. Defaults to False.
+        raw (bool): flag variable to store the digital values of the samples and convert them after the scan. Defaults to False.
+        target_error (float): target standard error in volt for adaptive sampling. Defaults to None.
+        min_samples (int): number of samples to take at each voltage level before checking the target error. Defaults to 2.
+        max_points (int): maximum number of voltage levels for a coarse-to-fine scan. Defaults to None.
+        coarse_step (int): step in digital values of the coarse pass of a coarse-to-fine scan. Defaults to 32.
+        scan_all (bool): flag variable to scan every matching device at the same time. Defaults to False.
+        journal (string): path of a journal in which every completed voltage is recorded. Defaults to None.
+        resume (string): path of the journal of an interrupted scan to continue. Defaults to None.
+        metrics (bool): flag variable to record the command latencies and step timing of the scan. Defaults to False.
+        profile (string): path at which a Chrome trace-event timeline of the scan should be stored. Defaults to None.
+        profile_stats (string): path at which the cProfile stats of the scan should be stored. Defaults to None.
     """
+    from pythondaq.controllers.instrumentation import profiling, span
+    from pythondaq.models.columnar import ColumnSink
+    from pythondaq.models.diode_experiment import DiodeExperiment
+    from pythondaq.models.sinks import CSVSink
+
     assert begin <= end, "Cannot have the begin value be greater then the end value"
     assert number > 0, "Cannot have a sample size of less then one"
-
+    assert port or scan_all or resume, "No device port was given"
+    assert not (
+        scan_all and (journal or resume)
+    ), "Journals can only be used when scanning a single device"
+
+    # The port of the interrupted scan is used, unless another port is given
+    if resume and not port:
+        ports = [None]
     # This uses the searh functionality of the list function to match incomplete port inputs
-    ports = list_devices(port)
-    assert len(ports) < 2, f"More than one device matches the given port value: {ports}"
+    else:
+        ports = list_devices(port) if port else list(list_devices())
     assert len(ports) > 0, "No devices match the given port value"
-    port = ports.pop()
+    if not scan_all and len(ports) > 1:
+        # Pick the device that responded during the last discovery
+        known_devices = DiodeExperiment().known_devices()
+        ports = [port for port in ports if port in known_devices] or ports
+    if not scan_all:
+        assert (
+            len(ports) < 2
+        ), f"More than one device matches the given port value: {ports}"
 
-    header, data = DiodeExperiment().scan(
-        port=port, start=begin, stop=end, sample_size=number
-    )
+    simulation = {"latency": latency, "noise": noise}
+    scan_options = {
+        "start": begin,
+        "stop": end,
+        "sample_size": number,
+        "deferred_output": deferred,
+        "raw": raw,
+        "target_error": target_error,
+        "min_samples": min_samples,
+        "max_points": max_points,
+        "coarse_step": coarse_step,
+        "journal": journal,
+    }
+
+    if scan_all:
+        from pythondaq.models.multi_device_experiment import MultiDeviceExperiment
+
+        multi_experiment = MultiDeviceExperiment(ports, simulation=simulation)
+        experiments = multi_experiment.experiments
+    else:
+        port = ports.pop()
+        experiments = {port: DiodeExperiment(simulation=simulation)}
+
+    if output:
+        # A CSV file grows while scanning, every device gets its own output when scanning multiple devices
+        sink_class = ColumnSink if output_format == "npy" else CSVSink
+        for port, experiment in experiments.items():
+            experiment.add_sink(
+                sink_class(device_output_path(output, port) if scan_all else output)
+            )
 
-    # Create lists to extract LED Voltages and currents plus their errors
-    led_volts = []
-    led_volt_errors = []
-    currents = []
-    current_errors = []
-
-    if not output:
-        for (
-            total_volt,
-            total_volt_error,
-            resistor_volt,
-            resistor_volt_error,
-            led_volt,
-            led_volt_error,
-            current,
-            current_error,
-            resistance,
-        ) in data:
-            led_volts.append(led_volt)
-            led_volt_errors.append(led_volt_error)
-            currents.append(current)
-            current_errors.append(current_error)
-
-        # print the lists containing the data
-        print(led_volts)
-        print(currents)
+    if metrics:
+        from pythondaq.controllers.instrumentation import (
+            METRICS_PATH,
+            ScanMetrics,
+            save_metrics,
+        )
+
+        # Every device gets its own metrics, labelled with its port
+        for port, experiment in experiments.items():
+            experiment.metrics = ScanMetrics(port)
+
+    # The timeline and cProfile stats cover the scan and building the plot, not the time the plot is shown
+    with profiling(profile, profile_stats) as tracer:
+        for experiment in experiments.values():
+            experiment.tracer = tracer
+
+        try:
+            if scan_all:
+                # Every device runs its own scan at the same time
+                results = multi_experiment.scan(**scan_options)
+                for failed_port, err in multi_experiment.errors.items():
+                    print(f"Scan on {failed_port} failed: {err}")
+            elif resume:
+                results = {port: experiments[port].resume(resume, port=port)}
+            else:
+                results = {port: experiments[port].scan(port=port, **scan_options)}
+
+        # The metrics of failed scans are stored too, they show the errors and timeouts
+        finally:
+            if metrics:
+                save_metrics(
+                    [experiment.metrics for experiment in experiments.values()]
+                )
+                print(f"Metrics are saved to {METRICS_PATH}")
 
         if graph:
-            # plotting the data
-            plt.errorbar(
-                led_volts,
-                currents,
-                xerr=led_volt_errors,
-                yerr=current_errors,
-                linestyle="None",
-                marker="o",
-                markersize=3,
-            )
+            with span(tracer, "import matplotlib", "plotting"):
+                import matplotlib.pyplot as plt
+
+        for port, (header, data) in results.items():
+            experiment = experiments[port]
+            if scan_all:
+                print(port)
+            if experiment.time_saved_per_step is not None:
+                print(
+                    f"Deferred output writes saved {experiment.time_saved_per_step * 1e3:.3f} ms per step"
+                )
+            if experiment.queries_saved is not None:
+                print(
+                    f"Adaptive sampling saved {experiment.queries_saved} queries compared to a sample size of {number}"
+                )
+
+            # print the columns containing the data
+            print(data["led_voltages"].tolist())
+            print(data["currents"].tolist())
+
+            if graph:
+                # plotting the data
+                with span(tracer, "plot", "plotting", port=port):
+                    plt.errorbar(
+                        data["led_voltages"],
+                        data["currents"],
+                        xerr=data["led_voltages_errors"],
+                        yerr=data["currents_errors"],
+                        linestyle="None",
+                        marker="o",
+                        markersize=3,
+                        label=port,
+                    )
 
+        if graph:
             # formatting the plot
-            plt.xlim(0, 3)
-            plt.ylim(0, 0.003)
-            plt.title("U,I-characteristic plot for an LED", fontsize=17)
-            plt.xlabel("LED volage (V)", fontsize=14)
-            plt.ylabel("LED current (A)", fontsize=14)
-            plt.tight_layout()
-            plt.show()
+            with span(tracer, "format plot", "plotting"):
+                plt.xlim(0, 3)
+                plt.ylim(0, 0.003)
+                plt.title("U,I-characteristic plot for an LED", fontsize=17)
+                plt.xlabel("LED volage (V)", fontsize=14)
+                plt.ylabel("LED current (A)", fontsize=14)
+                if scan_all:
+                    plt.legend()
+                plt.tight_layout()
+
+    if graph:
+        plt.show()
 
-    else:
-        with open(output, "w", newline="") as file:
-            writer = csv.writer(file)
-
-            # write the header into the file first
-            writer.writerow(header)
-
-            # unpack the zip object (data) with a for loop
-            for (
-                total_volt,
-                total_volt_error,
-                resistor_volt,
-                resistor_volt_error,
-                led_volt,
-                led_volt_error,
-                current,
-                current_error,
-                resistance,
-            ) in data:
-
-                # write all values into a the CSV file
-                writer.writerow(
-                    [
-                        total_volt,
-                        total_volt_error,
-                        resistor_volt,
-                        resistor_volt_error,
-                        led_volt,
-                        led_volt_error,
-                        current,
-                        current_error,
-                        resistance,
-                    ]
+    return
+
+
+@cmd_group.command()
+@click.option(
+    "-v",
+    "--voltage",
+    default=2.5,
+    type=click.FloatRange(0, 3.3),
+    help="Voltage at which the output is held",
+    show_default=True,
+)
+@click.option(
+    "-o",
+    "--output",
+    default="monitor.ring",
+    help="File path of the ring buffer file in which the samples are stored",
+    show_default=True,
+)
+@click.option(
+    "-c",
+    "--capacity",
+    default=1_000_000,
+    type=click.IntRange(1),
+    help="number of samples the file holds, the oldest samples are overwritten when it is full",
+    show_default=True,
+)
+@click.option(
+    "-t",
+    "--duration",
+    default=None,
+    type=click.FloatRange(0, min_open=True),
+    help="time in seconds to monitor, until Ctrl+C is pressed if not given",
+    show_default=True,
+)
+@click.option(
+    "-b",
+    "--block-size",
+    default=32,
+    type=click.IntRange(1),
+    help="number of samples per channel that are queried back-to-back",
+    show_default=True,
+)
+@click.option(
+    "--latency",
+    default=0.0,
+    type=click.FloatRange(0),
+    help="round-trip time per query in seconds, only used for the simulated device",
+    show_default=True,
+)
+@click.option(
+    "--noise",
+    default=1.0,
+    type=click.FloatRange(0),
+    help="measurement noise in ADC counts, only used for the simulated device",
+    show_default=True,
+)
+@click.argument("port", type=str)
+def monitor(port, voltage, output, capacity, duration, block_size, latency, noise):
+    """Function that holds the output at a fixed voltage and samples both channels continuously
+
+    Args:
+        port (string): port of the experiment controller device. Partial ports are attempted to be matched.
+        voltage (float): analog voltage at which the output is held. Defaults to 2.5.
+        output (string): path of the ring buffer file. Defaults to "monitor.ring".
+        capacity (int): number of samples the file holds. Defaults to 1000000.
+        duration (float): time in seconds to monitor, until Ctrl+C is pressed if None. Defaults to None.
+        block_size (int): number of samples per channel that are queried back-to-back. Defaults to 32.
+        latency (float): round-trip time per query of the simulated device in seconds. Defaults to 0.0.
+        noise (float): measurement noise of the simulated device in ADC counts. Defaults to 1.0.
+    """
+    import time
+
+    from pythondaq.models.diode_experiment import DiodeExperiment
+    from pythondaq.models.monitor import MonitorBuffer
+
+    ports = list_devices(port)
+    assert len(ports) > 0, "No devices match the given port value"
+    assert len(ports) < 2, f"More than one device matches the given port value: {ports}"
+
+    experiment = DiodeExperiment(simulation={"latency": latency, "noise": noise})
+    experiment.start_monitor(
+        ports[0],
+        voltage,
+        output,
+        capacity=capacity,
+        duration=duration,
+        block_size=block_size,
+    )
+
+    # The monitoring runs in its own thread, so Ctrl+C stops it after the current block
+    last_count, last_time = 0, time.perf_counter()
+    buffer = None
+    try:
+        while experiment.is_scanning.is_set():
+            time.sleep(1)
+
+            # The file is read with its own reader once the run has set it up, like other programs read it
+            if buffer is None:
+                if experiment.monitor_buffer is None:
+                    continue
+                buffer = MonitorBuffer(output)
+            count, now = buffer.count, time.perf_counter()
+            columns = buffer.columns(buffer.tail(count - last_count))
+            if len(columns["times"]):
+                print(
+                    f"\r{count} samples {(count - last_count) / (now - last_time):8.0f} samples/s "
+                    f"LED {columns['led_voltages'].mean():.3f} V {columns['currents'].mean() * 1e3:.4f} mA",
+                    end="",
+                    flush=True,
                 )
+            last_count, last_time = count, now
+    except KeyboardInterrupt:
+        experiment.stop_monitoring()
+    if buffer is not None:
+        buffer.close()
+    experiment.wait_for_monitor()
+    print()
 
-                # save values to plot/print later
-                led_volts.append(led_volt)
-                led_volt_errors.append(led_volt_error)
-                currents.append(current)
-                current_errors.append(current_error)
+    if experiment.monitor_error is not None:
+        raise experiment.monitor_error
+    print(f"Samples are saved to {output}")
 
-        # print the lists containing the data
-        print(led_volts)
-        print(currents)
 
-        if graph:
-            # plotting the data
-            plt.errorbar(
-                led_volts,
-                currents,
-                xerr=led_volt_errors,
-                yerr=current_errors,
-                linestyle="None",
-                marker="o",
-                markersize=3,
-            )
+@cmd_group.command()
+@click.option(
+    "-n",
+    "--number",
+    default=10,
+    type=click.IntRange(1),
+    help="number of samples to show",
+    show_default=True,
+)
+@click.argument("file_path", type=click.Path(exists=True, dir_okay=False))
+def tail(file_path, number):
+    """Function that shows the latest samples of a monitor file, also while it is written by diode monitor
 
-            # formatting the plot
-            plt.xlim(0, 3)
-            plt.ylim(0, 0.003)
-            plt.title("U,I-characteristic plot for an LED", fontsize=17)
-            plt.xlabel("LED volage (V)", fontsize=14)
-            plt.ylabel("LED current (A)", fontsize=14)
-            plt.tight_layout()
-            plt.show()
+    Args:
+        file_path (string): path of the ring buffer file.
+        number (int): number of samples to show. Defaults to 10.
+    """
+    from datetime import datetime
 
-    return
+    from pythondaq.models.monitor import MonitorBuffer
+
+    buffer = MonitorBuffer(file_path)
+    columns = buffer.columns(buffer.tail(number))
+    print(
+        f"{buffer.count} samples since {datetime.fromtimestamp(buffer.started).isoformat(timespec='seconds')}, "
+        f"output value {buffer.output_value}"
+    )
+    for time_stamp, led_voltage, current in zip(
+        columns["times"], columns["led_voltages"], columns["currents"]
+    ):
+        print(
+            f"{datetime.fromtimestamp(time_stamp).isoformat(timespec='microseconds')} "
+            f"{led_voltage:.2f} V {current * 1e3:.4f} mA"
+        )
+    buffer.close()
 
 
 if __name__ == "main":
@@ -1,19 +1,30 @@
 import sys
 
 from PySide6 import QtWidgets
-from PySide6.QtCore import Slot, QTimer
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
 from PySide6.QtGui import QAction
 import pyqtgraph as pg
 from pythondaq.models.diode_experiment import DiodeExperiment
+from pythondaq.models.monitor import MonitorBuffer
 import numpy as np
 import pandas as pd
 
 
+# Number of the latest samples shown in the monitor tab
+MONITOR_POINTS = 5000
+
 # PyQtGraph global options
 pg.setConfigOption("background", "w")
 pg.setConfigOption("foreground", "k")
 
 
+class ExperimentSignals(QObject):
+    """Class with the signals of the events of a scan, they are emitted in the scanning thread and received in the GUI thread"""
+
+    batch = Signal(object)
+    finished = Signal(object)
+
+
 class UserInterface(QtWidgets.QMainWindow):
     """Class to usde to create a UserInterface for the experiment view"""
 
@@ -27,12 +38,23 @@ class UserInterface(QtWidgets.QMainWindow):
         # create a model connection
         self.experiment = DiodeExperiment()
 
-        # Create plot widget
+        # Create plot widget, the items are made once and updated with new data
         self.plot_window = pg.PlotWidget()
+        self.plot_window.setLabel("left", "Current (A)")
+        self.plot_window.setLabel("bottom", "Volt (V)")
+        self.curve = self.plot_window.plot([], [], symbol="o", symbolSize=5, pen=None)
+        self.error_items = pg.ErrorBarItem(x=np.empty(0), y=np.empty(0))
+        self.plot_window.addItem(self.error_items)
+
+        # Generation of the experiment data that is plotted
+        self.plotted_generation = None
 
-        # Create central widget
+        # Create central widget, with a tab for scans and a tab for monitoring
         central_widget = QtWidgets.QWidget()
-        self.setCentralWidget(central_widget)
+        tabs = QtWidgets.QTabWidget()
+        tabs.addTab(central_widget, "Scan")
+        tabs.addTab(self._createMonitorTab(), "Monitor")
+        self.setCentralWidget(tabs)
 
         # Create vertical layout
         vbox = QtWidgets.QVBoxLayout(central_widget)
@@ -71,6 +93,18 @@ class UserInterface(QtWidgets.QMainWindow):
         self.sample_box.addWidget(sample_label)
         self.sample_box.addWidget(self.sample_input)
 
+        # Adaptive sampling, the sample size is then the maximum
+        self.adaptive_input = QtWidgets.QCheckBox("Target error (V)")
+        self.target_error_input = QtWidgets.QDoubleSpinBox()
+        self.target_error_input.setDecimals(4)
+        self.target_error_input.setRange(0.0001, 0.1)
+        self.target_error_input.setSingleStep(0.001)
+        self.target_error_input.setValue(0.003)
+        self.target_error_input.setEnabled(False)
+        self.adaptive_input.toggled.connect(self.target_error_input.setEnabled)
+        self.sample_box.addWidget(self.adaptive_input)
+        self.sample_box.addWidget(self.target_error_input)
+
         # Create Vbox for start and save button
         self.button_box = QtWidgets.QVBoxLayout()
         self.save_button = QtWidgets.QPushButton("save")
@@ -82,7 +116,16 @@ class UserInterface(QtWidgets.QMainWindow):
         self.device_box = QtWidgets.QVBoxLayout()
         device_label = QtWidgets.QLabel("Device")
         self.device_selection = QtWidgets.QComboBox()
-        self.device_selection.addItems(DiodeExperiment().get_connected_devices())
+        self.device_selection.addItems(
+            self.experiment.get_connected_devices(include_simulated=True)
+        )
+
+        # Select a device that responded during the last discovery
+        for port in self.experiment.known_devices():
+            index = self.device_selection.findText(port)
+            if index >= 0:
+                self.device_selection.setCurrentIndex(index)
+                break
         self.device_box.addWidget(device_label)
         self.device_box.addWidget(self.device_selection)
 
@@ -93,10 +136,15 @@ class UserInterface(QtWidgets.QMainWindow):
         hbox.addLayout(self.device_box)
         hbox.addLayout(self.button_box)
 
-        # Create plot timer that plots every 100ms
-        self.plot_timer = QTimer()
-        self.plot_timer.timeout.connect(self.plot)
-        self.plot_timer.start(100)
+        # The scan reports new points and its end with signals, so the window is only updated when something happened
+        self.signals = ExperimentSignals()
+        self.signals.batch.connect(self.show_batch)
+        self.signals.finished.connect(self.show_finished)
+        self.experiment.add_observer(
+            on_batch=self.signals.batch.emit,
+            on_finished=self.signals.finished.emit,
+            max_rate=30,
+        )
 
         # plot data on button click
         self.start_button.clicked.connect(self.run_measurement)
@@ -114,62 +162,163 @@ class UserInterface(QtWidgets.QMainWindow):
         if not self.experiment.is_scanning.is_set():
             try:
                 self.start_button.setEnabled(False)
+                self.monitor_button.setEnabled(False)
+                self.statusbar.showMessage("Scanning")
                 self.experiment.start_scan(
                     port=self.device_selection.currentText(),
                     start=self.start_input.value(),
                     stop=self.stop_input.value(),
                     sample_size=self.sample_input.value(),
+                    target_error=(
+                        self.target_error_input.value()
+                        if self.adaptive_input.isChecked()
+                        else None
+                    ),
                 )
 
             except Exception as err:
                 print(err)
                 self.create_pop_up("The selected device is not functional")
-
-            finally:
                 self.start_button.setEnabled(True)
+                self.monitor_button.setEnabled(True)
 
-    def plot(self):
-        """Method used to plot the results of a running experiment.
+    @Slot(object)
+    def show_batch(self, rows):
+        """Method used to show the points measured since the last batch
 
-        This method will only print results while an experiment is running
+        Args:
+            rows (np.ndarray): structured array with the new points
         """
-        if self.experiment.is_scanning.is_set():
-            # Clear old results
-            self.plot_window.clear()
-
-            # Plot new result
-            self.plot_window.plot(
-                self.experiment.led_voltages,
-                self.experiment.currents,
-                symbol="o",
-                symbolSize=5,
-                pen=None,
-            )
-            error_items = pg.ErrorBarItem(
-                x=np.array(self.experiment.led_voltages),
-                y=np.array(self.experiment.currents),
-                width=2 * np.array(self.experiment.led_voltages_errors),
-                height=2 * np.array(self.experiment.currents_errors),
+        self.plot()
+        self.statusbar.showMessage(f"Scanning, {self.experiment.size} points measured")
+
+    @Slot(object)
+    def show_finished(self, error):
+        """Method used to show the end of a scan
+
+        Args:
+            error (BaseException): the exception which stopped the scan, None if it was successful
+        """
+        self.plot()
+        self.start_button.setEnabled(True)
+        self.monitor_button.setEnabled(True)
+        if error is None:
+            self.statusbar.showMessage(
+                f"Scan finished, {self.experiment.size} points measured"
             )
+        else:
+            print(error)
+            self.statusbar.showMessage("Scan failed")
+            self.create_pop_up("The selected device is not functional")
 
-            self.plot_window.addItem(error_items)
+    def plot(self):
+        """Method used to plot the results of an experiment.
 
-            self.plot_window.setLabel("left", "Current (A)")
-            self.plot_window.setLabel("bottom", "Volt (V)")
+        The plot is only updated when the experiment data has changed since the last update
+        """
+        generation = self.experiment.generation
+        if generation == self.plotted_generation:
+            return
+        self.plotted_generation = generation
+
+        # The columns are views on the experiment data, they are not copied
+        data = self.experiment.snapshot()
+        self.curve.setData(data["led_voltages"], data["currents"])
+        self.error_items.setData(
+            x=data["led_voltages"],
+            y=data["currents"],
+            left=data["led_voltages_errors"],
+            right=data["led_voltages_errors"],
+            top=data["currents_errors"],
+            bottom=data["currents_errors"],
+        )
 
     @Slot()
     def save_data(self):
         """Method used to save the experiment data"""
         file_name, _ = QtWidgets.QFileDialog.getSaveFileName(filter="CSV files (*.csv)")
+
+        # A snapshot has the same number of points in every column, also while scanning
+        data = self.experiment.snapshot()
         pd.DataFrame(
             {
-                "Volt (V)": self.experiment.led_voltages,
-                "Volt error (V)": self.experiment.led_voltages_errors,
-                "Current (A)": self.experiment.currents,
-                "Current error (A)": self.experiment.currents_errors,
+                "Volt (V)": data["led_voltages"],
+                "Volt error (V)": data["led_voltages_errors"],
+                "Current (A)": data["currents"],
+                "Current error (A)": data["currents_errors"],
             }
         ).to_csv(file_name, index=False)
 
+    @Slot()
+    def toggle_monitor(self):
+        """Method used to start monitoring, or to stop it when it is running"""
+        if self.monitor_timer.isActive():
+            self.experiment.stop_monitoring()
+            self.monitor_button.setEnabled(False)
+            return
+        if self.experiment.is_scanning.is_set():
+            return
+
+        # The file of the last run is closed, the new run replaces it
+        self.close_monitor_reader()
+        self.monitor_path = self.monitor_path_input.text()
+        self.plotted_monitor_count = None
+        self.experiment.start_monitor(
+            port=self.device_selection.currentText(),
+            voltage=self.monitor_voltage_input.value(),
+            file_path=self.monitor_path,
+        )
+        self.start_button.setEnabled(False)
+        self.monitor_button.setText("stop")
+        self.statusbar.showMessage("Monitoring")
+        self.monitor_timer.start()
+
+    @Slot()
+    def show_monitor(self):
+        """Method used to plot the latest samples while monitoring, and to show the end of monitoring"""
+        scanning = self.experiment.is_scanning.is_set()
+
+        # The file is read like other programs read it, it is opened once the run has set it up
+        if self.monitor_reader is None and (
+            self.experiment.monitor_buffer is not None
+            or (not scanning and self.experiment.monitor_error is None)
+        ):
+            try:
+                self.monitor_reader = MonitorBuffer(self.monitor_path)
+            except (OSError, ValueError, AssertionError) as err:
+                # The file can be missing or not set up, e.g. when the run failed before it made the file
+                print(err)
+        buffer = self.monitor_reader
+        if buffer is not None and buffer.count != self.plotted_monitor_count:
+            self.plotted_monitor_count = buffer.count
+            columns = buffer.columns(buffer.tail(MONITOR_POINTS))
+            times = columns["times"] - buffer.started
+            self.monitor_voltage_curve.setData(times, columns["led_voltages"])
+            self.monitor_current_curve.setData(times, columns["currents"])
+            self.statusbar.showMessage(f"Monitoring, {buffer.count} samples taken")
+
+        if scanning:
+            return
+        self.close_monitor_reader()
+        self.monitor_timer.stop()
+        self.monitor_button.setText("start")
+        self.monitor_button.setEnabled(True)
+        self.start_button.setEnabled(True)
+        if self.experiment.monitor_error is None:
+            self.statusbar.showMessage(
+                f"Monitoring finished, {self.plotted_monitor_count or 0} samples taken"
+            )
+        else:
+            print(self.experiment.monitor_error)
+            self.statusbar.showMessage("Monitoring failed")
+            self.create_pop_up("The selected device is not functional")
+
+    def close_monitor_reader(self):
+        """Method used to close the monitor file after monitoring, so a next run can replace it"""
+        if self.monitor_reader is not None:
+            self.monitor_reader.close()
+            self.monitor_reader = None
+
     def create_pop_up(self, message):
         """Method to create a warning pop-up
 
@@ -199,6 +348,65 @@ class UserInterface(QtWidgets.QMainWindow):
         self.exit_action = QAction("&Exit", self)
         self.exit_action.triggered.connect(self.close)
 
+    def _createMonitorTab(self):
+        """Method to create the tab which holds the output at a voltage and shows the samples over time
+
+        Returns:
+            QtWidgets.QWidget: the tab
+        """
+        tab = QtWidgets.QWidget()
+        vbox = QtWidgets.QVBoxLayout(tab)
+
+        # The LED voltage and current are plotted against the time since monitoring started
+        voltage_plot = pg.PlotWidget()
+        voltage_plot.setLabel("left", "Volt (V)")
+        current_plot = pg.PlotWidget()
+        current_plot.setLabel("left", "Current (A)")
+        current_plot.setLabel("bottom", "Time (s)")
+        current_plot.setXLink(voltage_plot)
+        self.monitor_voltage_curve = voltage_plot.plot([], [], pen="b")
+        self.monitor_current_curve = current_plot.plot([], [], pen="r")
+        vbox.addWidget(voltage_plot)
+        vbox.addWidget(current_plot)
+
+        hbox = QtWidgets.QHBoxLayout()
+        vbox.addLayout(hbox)
+
+        # Create Vbox for the voltage the output is held at
+        voltage_box = QtWidgets.QVBoxLayout()
+        voltage_label = QtWidgets.QLabel("Output voltage")
+        self.monitor_voltage_input = QtWidgets.QDoubleSpinBox()
+        self.monitor_voltage_input.setRange(0.0, 3.3)
+        self.monitor_voltage_input.setSingleStep(0.01)
+        self.monitor_voltage_input.setValue(2.5)
+        voltage_box.addWidget(voltage_label)
+        voltage_box.addWidget(self.monitor_voltage_input)
+
+        # Create Vbox for the ring buffer file, other programs can read it while monitoring
+        path_box = QtWidgets.QVBoxLayout()
+        path_label = QtWidgets.QLabel("Monitor file")
+        self.monitor_path_input = QtWidgets.QLineEdit("monitor.ring")
+        path_box.addWidget(path_label)
+        path_box.addWidget(self.monitor_path_input)
+
+        self.monitor_button = QtWidgets.QPushButton("start")
+        self.monitor_button.clicked.connect(self.toggle_monitor)
+
+        hbox.addLayout(voltage_box)
+        hbox.addLayout(path_box)
+        hbox.addWidget(self.monitor_button)
+
+        # The samples are read from the ring buffer a few times per second, like other readers of the file do
+        self.monitor_timer = QTimer()
+        self.monitor_timer.setInterval(200)
+        self.monitor_timer.timeout.connect(self.show_monitor)
+
+        # Monitor file, its reader and the number of samples that are plotted
+        self.monitor_path = None
+        self.monitor_reader = None
+        self.plotted_monitor_count = None
+        return tab
+
     def _createStatusBar(self):
         self.statusbar = self.statusBar()
 
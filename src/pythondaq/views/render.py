@@ -0,0 +1,178 @@
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count, listdir, makedirs, path, replace
+import re
+
+from pythondaq.models.columnar import load_columns
+
+# Formats which the plots can be rendered to
+FORMATS = ("jpg", "png", "pdf", "svg")
+
+
+def image_base_name(data_path) -> str:
+    """This function gives the name of the image of a run without extension, ExperimentData_N gives ExperimentPlot_N
+
+    Args:
+        data_path (string): path of the CSV file or the column directory
+
+    Returns:
+        string: name of the image, the name of the data file if it is not numbered
+    """
+    name = path.splitext(path.basename(path.normpath(data_path)))[0]
+    match = re.fullmatch(r"ExperimentData_(\d+)", name)
+    return f"ExperimentPlot_{match.group(1)}" if match else name
+
+
+def image_paths(data_path, image_directory, formats=("jpg",), dpis=(100,)) -> list:
+    """This function gives the paths of all images of a run, a resolution is added to the name when there are several
+
+    Args:
+        data_path (string): path of the CSV file or the column directory
+        image_directory (string): directory where the images are saved
+        formats (tuple, optional): extensions of the image formats. Defaults to ("jpg",).
+        dpis (tuple, optional): resolutions in dots per inch. Defaults to (100,).
+
+    Returns:
+        list: tuples of the image path, its format and its resolution
+    """
+    base_name = image_base_name(data_path)
+    paths = []
+    for image_format in formats:
+        for dpi in dpis:
+            suffix = f"_{dpi}dpi" if len(dpis) > 1 else ""
+            name = f"{base_name}{suffix}.{image_format}"
+            paths.append((path.join(image_directory, name), image_format, dpi))
+    return paths
+
+
+def modification_time(data_path) -> float:
+    """This function gives the time a run was last changed, for a column directory the time of its newest file
+
+    Args:
+        data_path (string): path of the CSV file or the column directory
+
+    Returns:
+        float: modification time in seconds since the epoch
+    """
+    if path.isdir(data_path):
+        return max(
+            [path.getmtime(data_path)]
+            + [path.getmtime(path.join(data_path, name)) for name in listdir(data_path)]
+        )
+    return path.getmtime(data_path)
+
+
+def plot_data(axes, columns, label=None) -> None:
+    """This function draws the U,I-curve of a run on a set of axes
+
+    Args:
+        axes (matplotlib.axes.Axes): the axes to draw on
+        columns (dict): the columns of the run by column name
+        label (string, optional): label of the curve in the legend. Defaults to None.
+    """
+    axes.errorbar(
+        columns["led_voltages"],
+        columns["currents"],
+        xerr=columns["led_voltages_errors"],
+        yerr=columns["currents_errors"],
+        linestyle="None",
+        marker="o",
+        markersize=3,
+        label=label,
+    )
+
+    # formatting the plot
+    axes.set_xlim(0, 3)
+    axes.set_ylim(0, 0.003)
+    axes.set_title("U,I-characteristic plot for an LED", fontsize=17)
+    axes.set_xlabel("LED volage (V)", fontsize=14)
+    axes.set_ylabel("LED current (A)", fontsize=14)
+
+
+def render_file(data_path, images) -> dict:
+    """This function renders the plot of one run to several images, any error is returned instead of raised
+
+    The figure is made without pyplot, so no GUI backend is loaded and nothing is kept in global state. Every image
+    is written to a temporary file first, so an interrupted render does not leave an image that looks up-to-date.
+
+    Args:
+        data_path (string): path of the CSV file or the column directory
+        images (list): tuples of the image path, its format and its resolution
+
+    Returns:
+        dict: the paths of the rendered images, or the error message as "error"
+    """
+    # matplotlib is imported by the processes that render
+    from matplotlib.figure import Figure
+
+    try:
+        columns = load_columns(data_path)
+        assert len(columns["currents"]), "The run has no points"
+        figure = Figure(figsize=(6.4, 4.8))
+        plot_data(figure.add_subplot(), columns)
+        figure.tight_layout()
+        for image_path, image_format, dpi in images:
+            partial_path = f"{image_path}.partial"
+            figure.savefig(partial_path, format=image_format, dpi=dpi)
+            replace(partial_path, image_path)
+    except Exception as err:
+        return {"error": f"{type(err).__name__}: {err}"}
+    return {"images": [image_path for image_path, _, _ in images]}
+
+
+def render(
+    data_paths,
+    image_directory,
+    formats=("jpg",),
+    dpis=(100,),
+    workers=None,
+    force=False,
+) -> list:
+    """This function renders the plots of many runs in a process pool, images newer than their run are skipped
+
+    Args:
+        data_paths (list): paths of CSV files or column directories
+        image_directory (string): directory where the images are saved
+        formats (tuple, optional): extensions of the image formats. Defaults to ("jpg",).
+        dpis (tuple, optional): resolutions in dots per inch. Defaults to (100,).
+        workers (int, optional): number of processes, the number of CPUs if not given. Defaults to None.
+        force (bool, optional): also render images which are up-to-date. Defaults to False.
+
+    Returns:
+        list: a dict with the path, the rendered images, the skipped images and any error of every run
+    """
+    for image_format in formats:
+        assert image_format in FORMATS, f"Images can be saved as {', '.join(FORMATS)}"
+    makedirs(image_directory, exist_ok=True)
+
+    # Only the images which are older than their run are rendered
+    results = []
+    tasks = {}
+    for data_path in data_paths:
+        changed = modification_time(data_path)
+        result = {"path": data_path, "images": [], "skipped": []}
+        stale = []
+        for image in image_paths(data_path, image_directory, formats, dpis):
+            if (
+                not force
+                and path.isfile(image[0])
+                and path.getmtime(image[0]) >= changed
+            ):
+                result["skipped"].append(image[0])
+            else:
+                stale.append(image)
+        if stale:
+            tasks[len(results)] = (data_path, stale)
+        results.append(result)
+
+    # Rendering is CPU bound, so every process renders its own runs, a few runs at a time to save on messages
+    if tasks:
+        workers = workers or cpu_count() or 1
+        chunk_size = max(1, len(tasks) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rendered = executor.map(
+                render_file, *zip(*tasks.values()), chunksize=chunk_size
+            )
+            for index, result in zip(tasks, rendered):
+                results[index].update(result)
+
+    return results
@@ -1,6 +1,9 @@
+from pythondaq.controllers.instrumentation import profiling, span
+from pythondaq.models.catalog import ExperimentCatalog
 from pythondaq.models.diode_experiment import DiodeExperiment
-import csv
-from os import listdir, path, mkdir, getcwd
+from pythondaq.models.sinks import CSVSink
+from os import path, mkdir, getcwd
+import click
 import matplotlib.pyplot as plt
 
 # File path where the CSV will be saved (this will always create folders in de directory where it is run, it not a bug but a feature)
@@ -8,105 +11,83 @@ storage_path = f"{getcwd()}/DataStore/"
 image_path = f"{getcwd()}/ImageStore/"
 
 
-def main():
+@click.command()
+@click.option(
+    "--profile",
+    default=None,
+    help="File path where a timeline of the run is saved as Chrome trace-event JSON, for chrome://tracing or Perfetto",
+)
+@click.option(
+    "--profile-stats",
+    default=None,
+    help="File path where the cProfile stats of the run are saved, for pstats or snakeviz",
+)
+def main(profile, profile_stats):
+    """Runs an experiment, stores its data in the DataStore and its plot in the ImageStore and shows the plot
+
+    Args:
+        profile (string): path at which a Chrome trace-event timeline of the run should be stored. Defaults to None.
+        profile_stats (string): path at which the cProfile stats of the run should be stored. Defaults to None.
+    """
     # Check if given directories exist, if not create them
     if not path.isdir(storage_path):
         mkdir(storage_path)
     if not path.isdir(image_path):
         mkdir(image_path)
 
-    # Create list to store the iteration numbers
-    experiment_iterations = []
-    for file in listdir(storage_path):
-        # This is so unusual names do not cause an error
+    # The timeline and cProfile stats cover the run until the plot is shown
+    with profiling(profile, profile_stats) as tracer:
+        # The catalog gives every run its number, so the data and plot of a run have the same number
+        with span(tracer, "add run to catalog", "storage"):
+            catalog = ExperimentCatalog(storage_path)
+            scan_options = {
+                "port": "ASRL5::INSTR",
+                "start": 0.0,
+                "stop": 3.3,
+                "resistor_load": 220,
+                "sample_size": 5,
+            }
+            run_id, file_path = catalog.add_run(**scan_options)
+        image_name = f"ExperimentPlot_{run_id}.jpg"
+
+        # Initialize model and run experiment, the data is saved as CSV while scanning
+        experiment = DiodeExperiment()
+        experiment.tracer = tracer
+        experiment.add_sink(CSVSink(file_path))
         try:
-            experiment_iterations.append(int(file[15:-4]))
-        except:
-            pass
-    # Sort list and get last number
-    experiment_iterations.sort()
-
-    # if there are no previous iteration set value to -1 (then suffix becomes 0)
-    last_experiment_iteration = (
-        experiment_iterations[-1] if len(experiment_iterations) != 0 else -1
-    )
-
-    # Only check the data file so that the saved plots always have the same number
-    file_name = f"ExperimentData_{last_experiment_iteration+1}.csv"
-    image_name = f"ExperimentPlot_{last_experiment_iteration+1}.jpg"
-
-    # Initialize model and run experiment
-    experiment = DiodeExperiment()
-    header, data = experiment.scan(port="ASRL5::INSTR")
-
-    # Create lists to extract LED Volt and Current plus their errors
-    led_volts = []
-    led_volt_errors = []
-    currents = []
-    current_errors = []
-
-    # save the data as CSV
-    with open(storage_path + file_name, "w", newline="") as file:
-        writer = csv.writer(file)
-
-        # write the header into the file first
-        writer.writerow(header)
-
-        # unpack the zip object (data) with a for loop
-        for (
-            total_volt,
-            total_volt_resistance,
-            resistor_volt,
-            resistor_volt_resistance,
-            led_volt,
-            led_volt_resistance,
-            current,
-            current_resistance,
-            resistance,
-        ) in data:
-
-            # write all values into a the CSV file
-            writer.writerow(
-                [
-                    total_volt,
-                    total_volt_resistance,
-                    resistor_volt,
-                    resistor_volt_resistance,
-                    led_volt,
-                    led_volt_resistance,
-                    current,
-                    current_resistance,
-                    resistance,
-                ]
+            header, data = experiment.scan(**scan_options)
+        except BaseException:
+            catalog.finish_run(run_id, experiment.size, status="failed")
+            raise
+        with span(tracer, "finish run in catalog", "storage"):
+            catalog.finish_run(run_id, len(data))
+            catalog.close()
+
+        # plotting the data
+        with span(tracer, "plot", "plotting"):
+            plt.errorbar(
+                data["led_voltages"],
+                data["currents"],
+                xerr=data["led_voltages_errors"],
+                yerr=data["currents_errors"],
+                linestyle="None",
+                marker="o",
+                markersize=3,
             )
 
-            # save values to plot/print later
-            led_volts.append(led_volt)
-            led_volt_errors.append(led_volt_resistance)
-            currents.append(current)
-            current_errors.append(current_resistance)
-
-    # plotting the data
-    plt.errorbar(
-        led_volts,
-        currents,
-        xerr=led_volt_errors,
-        yerr=current_errors,
-        linestyle="None",
-        marker="o",
-        markersize=3,
-    )
+            # formatting the plot
+            plt.xlim(0, 3)
+            plt.ylim(0, 0.003)
+            plt.title("U,I-characteristic plot for an LED", fontsize=17)
+            plt.xlabel("LED volage (V)", fontsize=14)
+            plt.ylabel("LED current (A)", fontsize=14)
+            plt.tight_layout()
 
-    # formatting the plot
-    plt.xlim(0, 3)
-    plt.ylim(0, 0.003)
-    plt.title("U,I-characteristic plot for an LED", fontsize=17)
-    plt.xlabel("LED volage (V)", fontsize=14)
-    plt.ylabel("LED current (A)", fontsize=14)
-    plt.tight_layout()
+        # saving the plot
+        with span(tracer, "save plot", "plotting"):
+            plt.savefig(image_path + image_name)
 
-    # saving and showing the plot
-    plt.savefig(image_path + image_name)
+    # showing the plot
     plt.show()
 
     if __name__ == "__main__":
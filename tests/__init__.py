@@ -1,3 +0,0 @@
-from pythondaq.controllers.arduino_device import list_devices
-
-print(list_devices())
@@ -0,0 +1,55 @@
+import json
+
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT
+from pythondaq.models.analysis import analyze, fit_problems
+from pythondaq.models.diode_experiment import DiodeExperiment
+from pythondaq.models.sinks import CSVSink
+
+
+class SilentProgress:
+    """Stands in for a rich progress display"""
+
+    def track(self, values, total=None, description=None):
+        return values
+
+
+def fit_result(**changes):
+    result = {
+        "ideality_factor": 6.2,
+        "ideality_factor_error": 0.02,
+        "series_resistance": 0.5,
+        "series_resistance_error": 0.4,
+        "reduced_chi_squared": 1.1,
+    }
+    return {**result, **changes}
+
+
+def test_good_fit_has_no_problems():
+    assert fit_problems(fit_result()) == []
+    assert fit_problems(fit_result(series_resistance=-0.3)) == []
+
+
+def test_impossible_and_bad_fits_are_flagged():
+    assert fit_problems(fit_result(series_resistance=-8.39)) == [
+        "negative series resistance"
+    ]
+    assert fit_problems(fit_result(ideality_factor=0.5)) == ["ideality factor below 1"]
+    assert fit_problems(fit_result(reduced_chi_squared=40.0))[0].startswith("bad fit")
+
+
+def test_errors_are_not_cached(tmp_path):
+    good = str(tmp_path / "good.csv")
+    experiment = DiodeExperiment(simulation={"seed": 0})
+    experiment.add_sink(CSVSink(good))
+    experiment.scan(port=SIMULATED_PORT, sample_size=10, progress=SilentProgress())
+    broken = tmp_path / "broken.csv"
+    broken.write_text("LED voltage (V),Current (A)\n")
+    cache_path = str(tmp_path / "analysis.json")
+
+    results = analyze([good, str(broken)], cache_path=cache_path, workers=1)
+    assert "quality" in results[0]
+    assert "error" in results[1]
+
+    with open(cache_path) as file:
+        cache = json.load(file)
+    assert list(cache) == [results[0]["hash"]]
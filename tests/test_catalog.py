@@ -0,0 +1,16 @@
+from pythondaq.models.catalog import ExperimentCatalog
+
+
+def test_find_matches_wildcards_in_the_port_literally(tmp_path):
+    catalog = ExperimentCatalog(str(tmp_path))
+    for port in ["ASRL_1::INSTR", "ASRLX1::INSTR", "ASRL%2::INSTR", "ASRL\\3::INSTR"]:
+        catalog.add_run(port, 0.0, 3.3, 220, 3)
+
+    def ports(pattern):
+        return [run["port"] for run in catalog.find(port=pattern)]
+
+    assert ports("_1") == ["ASRL_1::INSTR"]
+    assert ports("%") == ["ASRL%2::INSTR"]
+    assert ports("\\") == ["ASRL\\3::INSTR"]
+    assert len(ports("ASRL")) == 4
+    catalog.close()
@@ -0,0 +1,17 @@
+from pythondaq.controllers.discovery import IN_USE, probe_device
+from pythondaq.controllers.resource_pool import pool
+
+# A port that is never opened, the pool only knows that it is in use
+PORT = "ASRL/dev/pythondaq-test::INSTR"
+
+
+def test_port_in_use_is_not_reported_as_dead():
+    pool._in_use.add(PORT)
+    try:
+        assert probe_device(PORT) == IN_USE
+    finally:
+        pool.release(PORT)
+
+
+def test_port_without_device_does_not_respond():
+    assert probe_device(PORT, timeout=0.1) is None
@@ -0,0 +1,40 @@
+import numpy as np
+
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT
+from pythondaq.models.diode_experiment import DiodeExperiment
+
+
+class SilentProgress:
+    """Stands in for a rich progress display"""
+
+    def track(self, values, total=None, description=None):
+        return values
+
+
+def scan(**options):
+    experiment = DiodeExperiment(simulation={"noise": 0})
+    _, data = experiment.scan(
+        port=SIMULATED_PORT, sample_size=1, progress=SilentProgress(), **options
+    )
+    return data
+
+
+def test_refined_points_land_on_the_knee():
+    # The knee runs from where the current starts to where it has reached a good part of its maximum
+    full = scan()
+    onset = full["total_voltages"][np.argmax(full["currents"] > 0)]
+    end = full["total_voltages"][
+        np.argmax(full["currents"] > 0.4 * full["currents"].max())
+    ]
+    assert end - onset < 1.0
+
+    coarse = scan(max_points=34)
+    refined = scan(max_points=100)
+    assert len(refined) == 100
+    assert np.all(np.diff(refined["total_voltages"]) >= 0)
+
+    # Most of the points that are added to the coarse pass are measured around the knee
+    new = ~np.isin(refined["total_voltages"], coarse["total_voltages"])
+    voltages = refined["total_voltages"][new]
+    on_knee = (voltages >= onset - 0.1) & (voltages <= end + 0.1)
+    assert on_knee.mean() > 0.6
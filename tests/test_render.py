@@ -0,0 +1,42 @@
+from os import path
+
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT
+from pythondaq.models.diode_experiment import DiodeExperiment
+from pythondaq.models.sinks import CSVSink
+from pythondaq.views import render as render_module
+from pythondaq.views.render import render, render_file
+
+
+class SilentProgress:
+    """Stands in for a rich progress display"""
+
+    def track(self, values, total=None, description=None):
+        return values
+
+
+def test_any_error_is_returned_per_file(tmp_path, monkeypatch):
+    def load_columns(data_path):
+        raise RuntimeError("malformed file")
+
+    monkeypatch.setattr(render_module, "load_columns", load_columns)
+    image = (str(tmp_path / "plot.png"), "png", 50)
+    assert render_file("run.csv", [image]) == {"error": "RuntimeError: malformed file"}
+
+
+def test_a_broken_run_does_not_stop_the_others(tmp_path):
+    good = str(tmp_path / "ExperimentData_1.csv")
+    experiment = DiodeExperiment(simulation={"seed": 0})
+    experiment.add_sink(CSVSink(good))
+    experiment.scan(
+        port=SIMULATED_PORT, stop=1.0, sample_size=2, progress=SilentProgress()
+    )
+    broken = tmp_path / "ExperimentData_2.csv"
+    broken.write_text("not,a\nrun\n")
+
+    images = str(tmp_path / "images")
+    results = render(
+        [good, str(broken)], images, formats=("png",), dpis=(50,), workers=2
+    )
+    assert "error" not in results[0]
+    assert path.isfile(results[0]["images"][0])
+    assert "error" in results[1]
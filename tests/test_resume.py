@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT
+from pythondaq.models.diode_experiment import DiodeExperiment
+from pythondaq.models.journal import ScanJournal
+
+# Output value at which the scan is interrupted
+INTERRUPT_AT = 150
+
+
+class Interrupted(Exception):
+    """Raised to interrupt a scan, like pressing Ctrl+C"""
+
+
+class InterruptingProgress:
+    """Stands in for a rich progress display and interrupts the scan at an output value"""
+
+    def __init__(self, interrupt_at=None) -> None:
+        self.interrupt_at = interrupt_at
+
+    def track(self, values, total=None, description=None):
+        for value in values:
+            if value == self.interrupt_at:
+                raise Interrupted
+            yield value
+
+
+def scan(journal=None, interrupt_at=None, raw=False):
+    experiment = DiodeExperiment(simulation={"noise": 0})
+    return experiment.scan(
+        port=SIMULATED_PORT,
+        start=0.0,
+        stop=1.0,
+        sample_size=3,
+        raw=raw,
+        journal=journal,
+        progress=InterruptingProgress(interrupt_at),
+    )
+
+
+def resume(journal):
+    experiment = DiodeExperiment(simulation={"noise": 0})
+    return experiment.resume(journal, progress=InterruptingProgress())
+
+
+@pytest.mark.parametrize("raw", [False, True], ids=["normal", "raw"])
+@pytest.mark.parametrize("cut_off", [False, True], ids=["complete", "cut-off"])
+def test_resumed_scan_equals_uninterrupted_scan(tmp_path, raw, cut_off):
+    journal = str(tmp_path / "scan.journal")
+    _, expected = scan(raw=raw)
+
+    with pytest.raises(Interrupted):
+        scan(journal, interrupt_at=INTERRUPT_AT, raw=raw)
+    _, steps, finished = ScanJournal.read(journal)
+    assert [step["output_value"] for step in steps] == list(range(INTERRUPT_AT))
+    assert not finished
+
+    # The process can die while it writes a line, the step is then measured again
+    if cut_off:
+        with open(journal, "a") as file:
+            file.write('{"output_value": %d, "val' % INTERRUPT_AT)
+
+    _, data = resume(journal)
+    assert len(data) == len(expected)
+    assert np.array_equal(data, expected)
+    _, steps, finished = ScanJournal.read(journal)
+    assert len(steps) == len(expected)
+    assert finished
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT
+from pythondaq.models.columnar import ColumnSink, load_columns
+from pythondaq.models.diode_experiment import DiodeExperiment
+from pythondaq.models.sinks import CSVSink
+
+
+class SilentProgress:
+    """Stands in for a rich progress display"""
+
+    def track(self, values, total=None, description=None):
+        return values
+
+
+@pytest.mark.parametrize("output_format", ["csv", "npy"])
+@pytest.mark.parametrize("max_points", [None, 60], ids=["full", "refined"])
+def test_saved_file_equals_returned_data(tmp_path, output_format, max_points):
+    if output_format == "csv":
+        output = str(tmp_path / "scan.csv")
+        sink = CSVSink(output, batch_size=16)
+    else:
+        output = str(tmp_path / "scan")
+        sink = ColumnSink(output)
+    experiment = DiodeExperiment(simulation={"noise": 0})
+    experiment.add_sink(sink)
+    _, data = experiment.scan(
+        port=SIMULATED_PORT,
+        start=1.5,
+        stop=3.0,
+        sample_size=2,
+        max_points=max_points,
+        progress=SilentProgress(),
+    )
+
+    # The rows of a refined scan are saved in the same order as they are returned, sorted by voltage
+    columns = load_columns(output)
+    assert np.all(np.diff(columns["total_voltages"]) >= 0)
+    for name in data.dtype.names:
+        assert np.array_equal(columns[name], data[name])
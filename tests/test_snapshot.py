@@ -0,0 +1,41 @@
+import threading
+import time
+
+import pytest
+
+from pythondaq.controllers.simulated_arduino import SIMULATED_PORT
+from pythondaq.models.data_format import check_snapshot
+from pythondaq.models.diode_experiment import DiodeExperiment
+
+
+@pytest.mark.parametrize("raw", [False, True], ids=["normal", "raw"])
+def test_snapshots_are_consistent_while_scanning(raw):
+    experiment = DiodeExperiment(simulation={"latency": 0.0001, "seed": 0})
+    stop = threading.Event()
+    snapshots = []
+    problems = set()
+
+    # Reader threads take snapshots while the scans run
+    def read():
+        while not stop.is_set():
+            rows = experiment.snapshot()
+            problems.update(check_snapshot(rows))
+            snapshots.append(len(rows))
+            time.sleep(0.0005)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for _ in range(2):
+            experiment.scan(
+                port=SIMULATED_PORT, start=0.0, stop=1.0, sample_size=3, raw=raw
+            )
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+
+    assert not problems
+    assert any(0 < length < len(experiment.snapshot()) for length in snapshots)
+    assert not check_snapshot(experiment.snapshot())